@@ -0,0 +1,193 @@
+"""
+Batch loading of many races, e.g. preparing a whole season's session cache overnight.
+
+Usage: python src/batch_loader.py --year 2024 [--race "Monaco Grand Prix" ...] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data_loader import load_race, RaceLoadError
+from session_cache import session_cache_path, load_session
+from compact_telemetry import telemetry_nbytes
+
+# Default in-memory budget for fully processed sessions
+SESSION_MEMORY_BUDGET_MB = 2048
+
+def race_data_nbytes(race_data):
+    """
+    Approximate resident size of a load_race result (its telemetry arrays).
+    """
+    drivers = race_data["drivers"]
+    if hasattr(drivers, "columns") and isinstance(drivers.columns, dict):
+        return sum(arr.nbytes for arr in drivers.columns.values())
+    return sum(telemetry_nbytes(telemetry) for telemetry in drivers.values())
+
+class SessionLRU:
+    """
+    Least-recently-used map of (year, race_name) -> race_data, bounded by total bytes.
+    A single session larger than the budget is still kept (alone) until replaced.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, race_data):
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        size = race_data_nbytes(race_data)
+        self._entries[key] = (race_data, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+class RaceResult:
+    """
+    Outcome of one race in a batch: error is None on success, else RaceLoadError.to_dict().
+    """
+
+    __slots__ = ("year", "race_name", "error", "seconds")
+
+    def __init__(self, year, race_name, error=None, seconds=0.0):
+        self.year = year
+        self.race_name = race_name
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"{self.error['stage']}: {self.error['message']}"
+        return f"RaceResult({self.year}, {self.race_name!r}, {status}, {self.seconds:.1f}s)"
+
+class BatchLoader:
+    """
+    Loads many races across a bounded process pool and serves them from memory.
+    load_many() reports per-race results instead of exiting on the first failure;
+    get() answers from the in-memory LRU, then the on-disk session cache, then FastF1.
+    """
+
+    def __init__(self, workers=2, use_cache=True, memory_budget_mb=SESSION_MEMORY_BUDGET_MB):
+        self.workers = max(1, workers)
+        self.use_cache = use_cache
+        self.sessions = SessionLRU(memory_budget_mb * 1024 * 1024)
+
+    def load_many(self, races):
+        """
+        Loads every (year, race_name) pair. Returns {(year, race_name): RaceResult}
+        in input order. With the disk cache on, workers only return a status and the
+        sessions are read back on demand by get(); otherwise results go to the LRU.
+        """
+        keys = list(dict.fromkeys((int(year), race_name) for year, race_name in races))
+        results = {key: None for key in keys}
+        todo = []
+        for key in keys:
+            if key in self.sessions:
+                results[key] = RaceResult(*key)
+            else:
+                todo.append(key)
+
+        print(f"📥 Batch loading {len(todo)} race(s) with {min(self.workers, max(1, len(todo)))} worker(s)...")
+        if self.workers <= 1 or len(todo) <= 1:
+            for key in todo:
+                results[key] = self._store(key, _load_one(key[0], key[1], self.use_cache))
+        else:
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(todo)),
+                mp_context=multiprocessing.get_context(method)
+            ) as executor:
+                futures = {executor.submit(_load_one, key[0], key[1], self.use_cache): key for key in todo}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        # The worker itself died (e.g. killed); report it like any other failure
+                        outcome = (RaceLoadError(key[0], key[1], "worker", str(e)).to_dict(), None, 0.0)
+                    results[key] = self._store(key, outcome)
+
+        failed = [r for r in results.values() if not r.ok]
+        print(f"✅ Batch complete: {len(results) - len(failed)} loaded, {len(failed)} failed.")
+        return results
+
+    def get(self, year, race_name):
+        """
+        Returns race_data for one race, loading it if needed.
+        Raises RaceLoadError like load_race.
+        """
+        key = (int(year), race_name)
+        race_data = self.sessions.get(key)
+        if race_data is None and self.use_cache:
+            race_data = load_session(session_cache_path(*key))
+        if race_data is None:
+            race_data = load_race(key[0], race_name, use_cache=self.use_cache)
+        self.sessions.put(key, race_data)
+        return race_data
+
+    def _store(self, key, outcome):
+        error, race_data, seconds = outcome
+        if race_data is not None:
+            self.sessions.put(key, race_data)
+        return RaceResult(key[0], key[1], error, seconds)
+
+def _load_one(year, race_name, use_cache):
+    """
+    Worker entry point. Returns (error dict or None, race_data or None, seconds).
+    """
+    started = time.perf_counter()
+    try:
+        race_data = load_race(year, race_name, use_cache=use_cache)
+    except RaceLoadError as e:
+        return e.to_dict(), None, time.perf_counter() - started
+    except Exception as e:
+        error = RaceLoadError(year, race_name, "processing", f"{type(e).__name__}: {e}")
+        return error.to_dict(), None, time.perf_counter() - started
+
+    # With the disk cache on the session is already saved; skip pickling it back
+    return None, (None if use_cache else race_data), time.perf_counter() - started
+
+def season_races(year):
+    """
+    Names of every (non-testing) event in a season, from FastF1's schedule.
+    """
+    import fastf1
+
+    fastf1.Cache.enable_cache("cache")
+    schedule = fastf1.get_event_schedule(year, include_testing=False)
+    return [(year, name) for name in schedule["EventName"].tolist()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess many races into the session cache")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--race", action="append", default=None, help="Race to load (repeatable; default: whole season)")
+    parser.add_argument("--workers", type=int, default=2, help="Races loaded in parallel")
+    args = parser.parse_args()
+
+    races = [(args.year, race) for race in args.race] if args.race else season_races(args.year)
+    results = BatchLoader(workers=args.workers).load_many(races)
+    for result in results.values():
+        if not result.ok:
+            print(f"   ❌ {result.year} {result.race_name}: {result.error['stage']} - {result.error['message']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Offline micro-benchmarks for the loader and replay hot paths.
+Runs on synthetic telemetry, so neither FastF1 nor network access is needed.
+
+Usage: python src/benchmark.py [--drivers 20] [--samples 20000] [--frames 600]
+       python src/benchmark.py --hz 4 --race-seconds 5400 --json results.json
+       python src/benchmark.py --race "Monaco Grand Prix" --year 2024 --workers 4
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from replay import get_interpolated_state, build_track_points, scale_point
+from replay_state import PackedReplayState, PlaybackCursor, cumulative_distance
+from timeline import Timeline
+from compact_telemetry import compact_drivers
+from race_order import RaceOrderTimeline
+from data_loader import compute_bounds, build_global_timeline, lap_distance, estimate_track_length
+
+def synthetic_drivers(n_drivers=20, n_samples=20000, seed=0, sample_hz=4.0, lap_seconds=90.0):
+    """
+    Builds {driver: DataFrame} in the shape load_race returns (with CumDist and LapDist).
+    Cars lap an elliptical circuit at slightly different paces with sample times
+    jittered +/-40% around 1/sample_hz.
+    """
+    rng = np.random.default_rng(seed)
+    mean_step = 1.0 / sample_hz
+    drivers_data = {}
+    for k in range(n_drivers):
+        steps = rng.uniform(0.6 * mean_step, 1.4 * mean_step, n_samples)
+        t = np.cumsum(steps)
+        pace = 1.0 - 0.004 * k
+        angle = 2 * np.pi * t / lap_seconds * pace
+        x = 2500.0 * np.cos(angle)
+        y = 1200.0 * np.sin(angle)
+        df = pd.DataFrame({
+            "Time": t,
+            "X": x,
+            "Y": y,
+            "LapNumber": np.floor(angle / (2 * np.pi)) + 1,
+        })
+        df["CumDist"] = cumulative_distance(x, y)
+        df["LapDist"] = lap_distance(df["CumDist"].values, df["LapNumber"].values)
+        drivers_data[str(k + 1)] = df
+    return drivers_data
+
+def synthetic_race(n_drivers=20, sample_hz=4.0, race_seconds=5000.0, lap_seconds=90.0, seed=0):
+    """
+    A complete load_race result (drivers, track, metadata) for a race of race_seconds.
+    """
+    n_samples = max(2, int(race_seconds * sample_hz))
+    drivers_data = synthetic_drivers(n_drivers, n_samples, seed, sample_hz, lap_seconds)
+    total_laps = int(max(df["LapNumber"].iloc[-1] for df in drivers_data.values()))
+    metadata = {
+        "year": 0,
+        "race_name": "Synthetic Grand Prix",
+        "session": "Race",
+        "total_laps": total_laps,
+        "track_length": estimate_track_length([df["CumDist"].iloc[-1] for df in drivers_data.values()], total_laps),
+        "driver_info": {
+            drv: {"Abbreviation": f"D{drv:0>2}", "TeamColor": "#FF8700", "TeamName": "Synthetic"}
+            for drv in drivers_data
+        }
+    }
+    return {
+        "drivers": drivers_data,
+        "track": {
+            "bounds": compute_bounds(drivers_data),
+            "timeline": build_global_timeline(drivers_data)
+        },
+        "metadata": metadata
+    }
+
+def _frame_times(drivers_data, n_frames, fps=60.0, speed=1.0):
+    # Consecutive frames of real-time playback, as run_replay would request them
+    start = min(df["Time"].iloc[0] for df in drivers_data.values())
+    return start + np.arange(n_frames) * (speed / fps)
+
+def bench_interpolation(drivers_data, n_frames):
+    """
+    Per-frame cost of querying every driver: per-driver iloc lookups vs one packed call,
+    and the packed call driven by a forward playback cursor (full and compact dtypes).
+    """
+    times = _frame_times(drivers_data, n_frames)
+
+    start = time.perf_counter()
+    for t in times:
+        for df in drivers_data.values():
+            get_interpolated_state(df, t)
+    legacy = (time.perf_counter() - start) / n_frames
+
+    state = PackedReplayState.from_frames(drivers_data)
+    start = time.perf_counter()
+    for t in times:
+        state.interpolate(t)
+    packed = (time.perf_counter() - start) / n_frames
+
+    cursor = PlaybackCursor(state, times[0])
+    start = time.perf_counter()
+    for t in times:
+        cursor.interpolate(t)
+    cursored = (time.perf_counter() - start) / n_frames
+
+    cursor = PlaybackCursor(PackedReplayState.from_frames(compact_drivers(drivers_data)), times[0])
+    start = time.perf_counter()
+    for t in times:
+        cursor.interpolate(t)
+    compact = (time.perf_counter() - start) / n_frames
+
+    return {"get_interpolated_state": legacy, "packed": packed, "packed + cursor": cursored,
+            "compact + cursor": compact}
+
+def bench_leaderboard(drivers_data, n_frames):
+    """
+    Per-frame race order and gaps: sort by distance each frame vs precomputed lookup.
+    """
+    times = _frame_times(drivers_data, n_frames)
+    state = PackedReplayState.from_frames(drivers_data)
+
+    start = time.perf_counter()
+    for t in times:
+        _, _, dists, _ = state.interpolate(t)
+        rows = [{"id": drv, "dist": dists[k]} for k, drv in enumerate(state.driver_ids)]
+        rows.sort(key=lambda x: x["dist"], reverse=True)
+        {d["id"]: (rows[0]["dist"] - d["dist"]) / 70.0 for d in rows}
+    per_frame_sort = (time.perf_counter() - start) / n_frames
+
+    start = time.perf_counter()
+    race_order = RaceOrderTimeline(state, state.time[state.offsets].min(), state.time[state.ends].max())
+    # Windows are filled on first use; time the one the frames below start in
+    race_order.at(times[0])
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in times:
+        race_order.at(t)
+    lookup = (time.perf_counter() - start) / n_frames
+
+    print(f"   (RaceOrderTimeline window of {race_order.window} grid points filled in {build * 1e3:.1f} ms; "
+          f"{len(race_order)} in the race)")
+    return {"sort + 70 m/s gaps": per_frame_sort, "precomputed lookup": lookup}
+
+def _legacy_global_timeline(drivers_data):
+    # The set-of-floats timeline load_race used to build, kept as a reference point
+    times = set()
+    for telemetry in drivers_data.values():
+        if not telemetry.empty:
+            times.update(telemetry["Time"].values)
+    return sorted(list(times))
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def bench_timeline(drivers_data):
+    """
+    Time and peak traced memory of building the global timeline three ways.
+    """
+    results = {
+        "set + sorted": _measure(lambda: _legacy_global_timeline(drivers_data)),
+        "Timeline.merged_times": _measure(lambda: Timeline.merged_times(drivers_data)),
+        "Timeline (lazy)": _measure(lambda: Timeline.from_frames(drivers_data).end),
+    }
+    print("Global timeline:")
+    for label, (elapsed, peak) in results.items():
+        print(f"   {label:<24} {elapsed * 1e3:10.1f} ms   peak {peak / 2**20:8.1f} MiB")
+    return results
+
+def bench_held_memory(race_data, screen_size=(1280, 850)):
+    """
+    Traced memory still held after a warm session-cache load, per representation,
+    and again once a ReplayScene is built on it the way main() does (pack_race).
+    Counts everything race_data and the scene keep alive, not just telemetry arrays.
+    """
+    import gc
+    import tempfile
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from session_cache import save_session
+    from data_loader import load_cached_race
+    from replay import ReplayScene, pack_race
+
+    pygame.init()
+    pygame.display.set_mode(screen_size)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.npz")
+        save_session(race_data, path)
+        for label, kwargs in (("full float64", {}),
+                              ("compact (s)", {"compact": True, "time_unit": "s"}),
+                              ("compact (ms)", {"compact": True, "time_unit": "ms"})):
+            gc.collect()
+            tracemalloc.start()
+            loaded = load_cached_race(path, **kwargs)
+            gc.collect()
+            results[label], _ = tracemalloc.get_traced_memory()
+
+            pack_race(loaded)
+            scene = ReplayScene(
+                loaded["drivers"],
+                loaded["track"]["bounds"],
+                loaded["track"]["timeline"],
+                loaded["metadata"],
+                screen_size
+            )
+            gc.collect()
+            results[f"{label} + scene"], _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del loaded, scene
+    pygame.quit()
+    return results
+
+def bench_loader(drivers_data, repeats=5):
+    """
+    Post-extraction loader steps run on every load: bounds, timeline and packing.
+    """
+    def best_of(fn):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    return {
+        "compute_bounds": best_of(lambda: compute_bounds(drivers_data)),
+        "build_global_timeline": best_of(lambda: build_global_timeline(drivers_data).end),
+        "PackedReplayState.from_frames": best_of(lambda: PackedReplayState.from_frames(drivers_data)),
+    }
+
+def bench_frame_loop(race_data, n_frames, screen_size=(1280, 850), speed=1.0):
+    """
+    Headless replay frames (ReplayScene.draw at 60 fps steps) on SDL's dummy driver.
+    Returns the mean per-frame time, followed by the mean of each profiled span.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from replay import ReplayScene
+    from profiler import FrameProfiler
+
+    pygame.init()
+    screen = pygame.display.set_mode(screen_size)
+    scene = ReplayScene(
+        race_data["drivers"],
+        race_data["track"]["bounds"],
+        race_data["track"]["timeline"],
+        race_data["metadata"],
+        screen_size
+    )
+    profiler = FrameProfiler(window=n_frames)
+    scene.profiler = profiler
+
+    times = _frame_times(race_data["drivers"], n_frames, speed=speed)
+    start = time.perf_counter()
+    for t in times:
+        profiler.begin_frame()
+        scene.draw(screen, t, speed)
+        profiler.end_frame()
+    per_frame = (time.perf_counter() - start) / n_frames
+    pygame.quit()
+
+    results = {"frame": per_frame}
+    results.update(profiler.summary()["spans"])
+    return results
+
+def bench_track_points(drivers_data, bounds, screen_size=(1280, 850)):
+    """
+    Track outline construction: row-by-row scale_point vs one array projection.
+    """
+    best = max(drivers_data.values(), key=len)
+
+    start = time.perf_counter()
+    [scale_point(row["X"], row["Y"], bounds, screen_size) for _, row in best.iterrows()]
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    build_track_points(drivers_data, bounds, screen_size)
+    projected = time.perf_counter() - start
+
+    return {"iterrows + scale_point": legacy, "Projection.apply": projected}
+
+def bench_extraction(year, race_name, workers):
+    """
+    Wall-clock time of per-driver extraction for a real session, serial vs parallel.
+    Needs FastF1 and either network access or a warm FastF1 cache.
+    """
+    import fastf1
+    from data_loader import extract_drivers
+
+    fastf1.Cache.enable_cache("cache")
+    session = fastf1.get_session(year, race_name, "R")
+    session.load(telemetry=True, laps=True, weather=False)
+
+    results = {}
+    for label, n_workers, pool in (("serial", 1, "process"),
+                                   (f"{workers} threads", workers, "thread"),
+                                   (f"{workers} processes", workers, "process")):
+        start = time.perf_counter()
+        extract_drivers(session, workers=n_workers, pool=pool)
+        results[label] = time.perf_counter() - start
+    print()
+    return results
+
+def _report(name, results, unit="us/frame", scale=1e6, relative=True):
+    baseline = next(iter(results.values()))
+    print(f"{name}:")
+    for label, per_frame in results.items():
+        ratio = f"   x{baseline / per_frame:6.1f}" if relative and per_frame > 0 else ""
+        print(f"   {label:<30} {per_frame * scale:10.1f} {unit}{ratio}")
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def write_json(path, config, results):
+    """
+    Writes one benchmark run (seconds throughout) for comparing commits offline.
+    """
+    record = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    print(f"📄 Results written to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Loader and replay hot-path benchmarks")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=20000, help="Samples per driver (ignored with --race-seconds)")
+    parser.add_argument("--hz", type=float, default=4.0, help="Mean telemetry sample rate per driver")
+    parser.add_argument("--race-seconds", type=float, default=None, help="Race length; sets samples to hz x seconds")
+    parser.add_argument("--frames", type=int, default=600, help="Frames to time")
+    parser.add_argument("--no-frame-loop", action="store_true", help="Skip the headless rendering benchmark")
+    parser.add_argument("--json", metavar="PATH", default=None, help="Also write all results as JSON")
+    parser.add_argument("--race", default=None, help="Also time driver extraction for this race (needs FastF1)")
+    parser.add_argument("--year", type=int, default=2024, help="Season of --race")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel workers for --race")
+    args = parser.parse_args()
+
+    race_seconds = args.race_seconds if args.race_seconds else args.samples / args.hz
+    race_data = synthetic_race(args.drivers, args.hz, race_seconds)
+    drivers_data = race_data["drivers"]
+    bounds = race_data["track"]["bounds"]
+    print(f"Synthetic race: {args.drivers} drivers x {len(next(iter(drivers_data.values())))} samples "
+          f"({args.hz:g} Hz, {race_seconds:.0f} s)")
+
+    results = {}
+    results["interpolation"] = bench_interpolation(drivers_data, args.frames)
+    _report("Interpolation", results["interpolation"])
+    results["leaderboard"] = bench_leaderboard(drivers_data, args.frames)
+    _report("Leaderboard", results["leaderboard"])
+    results["loader"] = bench_loader(drivers_data)
+    _report("Loader steps", results["loader"], unit="ms", scale=1e3, relative=False)
+    results["held_memory"] = bench_held_memory(race_data)
+    _report("Memory held after a cached load (and with a scene)", results["held_memory"], unit="MiB", scale=1 / 2**20)
+    timeline = bench_timeline(drivers_data)
+    results["timeline"] = {label: {"seconds": elapsed, "peak_bytes": peak} for label, (elapsed, peak) in timeline.items()}
+    results["track_points"] = bench_track_points(drivers_data, bounds)
+    _report("Track points", results["track_points"], unit="ms", scale=1e3)
+    if not args.no_frame_loop:
+        results["frame_loop"] = bench_frame_loop(race_data, args.frames)
+        _report("Headless frame loop", results["frame_loop"], unit="ms/frame", scale=1e3, relative=False)
+
+    if args.race:
+        from data_loader import load_race
+        bench_timeline(load_race(args.year, args.race)["drivers"])
+        results["extraction"] = bench_extraction(args.year, args.race, args.workers)
+        _report("Driver extraction", results["extraction"], unit="s", scale=1)
+
+    if args.json:
+        config = {
+            "drivers": args.drivers, "hz": args.hz, "race_seconds": race_seconds,
+            "frames": args.frames, "race": args.race, "year": args.year if args.race else None
+        }
+        write_json(args.json, config, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import numpy as np
+
+# Storage dtype of each column in compact mode; Time depends on the time unit
+COMPACT_DTYPES = {
+    "X": np.float32,
+    "Y": np.float32,
+    "CumDist": np.float32,
+    "LapDist": np.float32,
+    "LapNumber": np.uint8,
+}
+
+# "s": Time kept as float64 seconds; "ms": int32 milliseconds since session start
+TIME_UNITS = ("s", "ms")
+
+class CompactTelemetry:
+    """
+    Array-backed stand-in for one driver's telemetry DataFrame in compact mode:
+    positions and distances as float32, LapNumber as uint8 and Time as float64
+    seconds or int32 milliseconds. Supports the subset of the DataFrame interface
+    the loader and replay use (len, .empty, .columns, `in`, and telemetry["Col"]
+    returning a NumPy array; "Time" always reads back as float64 seconds).
+    """
+
+    __slots__ = ("time", "x", "y", "lap", "cum_dist", "lap_dist", "time_unit")
+
+    # Column name -> slot, in the order load_race produces them
+    _SLOTS = {
+        "Time": "time",
+        "X": "x",
+        "Y": "y",
+        "LapNumber": "lap",
+        "CumDist": "cum_dist",
+        "LapDist": "lap_dist",
+    }
+
+    def __init__(self, time, x, y, lap, cum_dist=None, lap_dist=None, time_unit="s"):
+        if time_unit not in TIME_UNITS:
+            raise ValueError(f"time_unit must be one of {TIME_UNITS}, not {time_unit!r}")
+        self.time_unit = time_unit
+        if time_unit == "ms":
+            self.time = np.round(np.asarray(time, dtype=np.float64) * 1000.0).astype(np.int32)
+        else:
+            # A copy: a view would keep the source DataFrame's whole float64 block alive
+            self.time = np.array(time, dtype=np.float64)
+        self.x = np.asarray(x, dtype=COMPACT_DTYPES["X"])
+        self.y = np.asarray(y, dtype=COMPACT_DTYPES["Y"])
+        self.lap = np.asarray(lap, dtype=COMPACT_DTYPES["LapNumber"])
+        self.cum_dist = None if cum_dist is None else np.asarray(cum_dist, dtype=COMPACT_DTYPES["CumDist"])
+        self.lap_dist = None if lap_dist is None else np.asarray(lap_dist, dtype=COMPACT_DTYPES["LapDist"])
+
+    @classmethod
+    def from_frame(cls, df, time_unit="s"):
+        """
+        Converts one cleaned load_race frame (CumDist/LapDist are optional).
+        """
+        return cls(
+            np.asarray(df["Time"], dtype=np.float64),
+            df["X"],
+            df["Y"],
+            df["LapNumber"],
+            df["CumDist"] if "CumDist" in df else None,
+            df["LapDist"] if "LapDist" in df else None,
+            time_unit=time_unit
+        )
+
+    @property
+    def columns(self):
+        return [col for col, slot in self._SLOTS.items() if getattr(self, slot) is not None]
+
+    @property
+    def empty(self):
+        return len(self.time) == 0
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, self._SLOTS[col]).nbytes for col in self.columns)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __contains__(self, col):
+        slot = self._SLOTS.get(col)
+        return slot is not None and getattr(self, slot) is not None
+
+    def __getitem__(self, col):
+        if col not in self:
+            raise KeyError(col)
+        if col == "Time" and self.time_unit == "ms":
+            return self.time / 1000.0
+        return getattr(self, self._SLOTS[col])
+
+    def __repr__(self):
+        return f"CompactTelemetry(rows={len(self)}, time_unit={self.time_unit!r}, {self.nbytes / 1024:.0f} KiB)"
+
+def compact_drivers(drivers_data, time_unit="s"):
+    """
+    Returns {driver: CompactTelemetry} for a {driver: DataFrame} mapping.
+    """
+    return {drv: CompactTelemetry.from_frame(df, time_unit) for drv, df in drivers_data.items()}
+
+def telemetry_nbytes(telemetry):
+    """
+    Bytes held by one driver's telemetry, DataFrame or CompactTelemetry.
+    """
+    if isinstance(telemetry, CompactTelemetry):
+        return telemetry.nbytes
+    return int(telemetry.memory_usage(index=False).sum())
@@ -1,16 +1,80 @@
-import fastf1
+import numpy as np
 import pandas as pd
+import multiprocessing
+import threading
 import warnings
+import time
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from session_cache import session_cache_path, load_session, save_session
+from telemetry_store import store_path, open_store, write_store
+from timeline import Timeline
+from replay_state import PackedReplayState, cumulative_distance
+from compact_telemetry import CompactTelemetry, COMPACT_DTYPES, compact_drivers
 
 # Suppress technical warnings for a cleaner console
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-def load_race(year: int, race_name: str):
+# Fallback (min_x, max_x, min_y, max_y) when there are no samples at all
+EMPTY_BOUNDS = (0, 100, 0, 100)
+
+# Robust bounds drop this percentage of samples at each end of X and Y per driver
+BOUNDS_CLIP_PERCENT = 0.05
+
+class RaceLoadError(Exception):
+    """
+    Raised when a race cannot be loaded. stage is "session", "download" or "drivers".
+    """
+
+    def __init__(self, year, race_name, stage, message):
+        super().__init__(message)
+        self.year = year
+        self.race_name = race_name
+        self.stage = stage
+        self.message = message
+
+    def to_dict(self):
+        return {"year": self.year, "race_name": self.race_name, "stage": self.stage, "message": self.message}
+
+def load_race(year: int, race_name: str, use_cache: bool = True, workers: int = 1,
+              compact: bool = False, time_unit: str = "s"):
     """
     Loads F1 telemetry data for a specific year and race.
     Returns a structured dictionary containing drivers, track data, and metadata.
+    Processed results are cached on disk; repeat loads skip FastF1 entirely.
+    workers > 1 extracts drivers in parallel (see extract_drivers).
+    compact=True stores each driver as a CompactTelemetry (float32/uint8 columns,
+    Time as float64 seconds or, with time_unit="ms", int32 milliseconds).
+    Raises RaceLoadError when the session cannot be found, downloaded or has no drivers.
     """
+    for event in stream_race(year, race_name, use_cache=use_cache, workers=workers,
+                             compact=compact, time_unit=time_unit):
+        if event[0] == "done":
+            return event[1]
+
+def stream_race(year: int, race_name: str, use_cache: bool = True, workers: int = 1,
+                compact: bool = False, time_unit: str = "s"):
+    """
+    Generator form of load_race, for consumers that start before every driver is ready.
+    Yields ("metadata", metadata) once (driver_info still empty), then
+    ("driver", driver, info, telemetry) as each driver's frame is finished, and
+    finally ("done", race_data) with exactly what load_race returns.
+    """
+    cache_path = session_cache_path(year, race_name)
+    if use_cache:
+        cached = load_cached_race(cache_path, compact=compact, time_unit=time_unit)
+        if cached is not None:
+            print(f"⚡ Loaded preprocessed session from {cache_path}")
+            driver_info = cached["metadata"]["driver_info"]
+            yield ("metadata", dict(cached["metadata"], driver_info={}))
+            for driver, telemetry in cached["drivers"].items():
+                yield ("driver", driver, driver_info.get(driver), telemetry)
+            yield ("done", cached)
+            return
+
+    # Imported lazily so warm-cache starts never pay for FastF1's import
+    import fastf1
+
     print(f"⏳ Initializing FastF1 for {year} {race_name}...")
     fastf1.Cache.enable_cache("cache")
     
@@ -19,128 +83,395 @@ def load_race(year: int, race_name: str):
         print(f"📍 Found Session: {session.event['EventName']} - {session.name}")
     except Exception as e:
         print(f"❌ Could not find race session: {e}")
-        sys.exit(1)
+        raise RaceLoadError(year, race_name, "session", str(e)) from e
 
     print("📥 Downloading telemetry data (this may take a minute)...")
     try:
         session.load(telemetry=True, laps=True, weather=False)
     except Exception as e:
         print(f"❌ Error downloading data: {e}")
-        sys.exit(1)
+        raise RaceLoadError(year, race_name, "download", str(e)) from e
     
     print("⚙️ Processing driver telemetry...")
-    drivers_data = {}
-    driver_info = {}
     
     # Calculate official total laps
     try:
         total_laps = int(session.laps["LapNumber"].max())
     except Exception: # Fixed bare except
         total_laps = 0
+
+    metadata = {
+        "year": year,
+        "race_name": session.event["EventName"],
+        "session": session.name,
+        "total_laps": total_laps,
+        "driver_info": {}
+    }
+    yield ("metadata", dict(metadata, driver_info={}))
     
-    drivers_list = session.drivers
-    total_drivers = len(drivers_list)
-    
-    for i, driver in enumerate(drivers_list):
-        sys.stdout.write(f"\r   Processing driver {i+1}/{total_drivers} ({driver})")
-        sys.stdout.flush()
-        
-        try:
-            laps = session.laps.pick_drivers(driver)
-            if laps.empty:
-                continue
-            
-            # Extract Metadata
-            drv_details = session.get_driver(driver)
-            color = drv_details.get("TeamColor", "CCCCCC")
-            if not color or color == "": color = "CCCCCC"
-                
-            driver_info[driver] = {
-                "Abbreviation": drv_details["Abbreviation"],
-                "TeamColor": f"#{color}",
-                "TeamName": drv_details["TeamName"]
-            }
-            
-            # Extract Telemetry
-            telemetry = laps.get_telemetry()
-            
-            # --- ROBUST DATA CLEANING ---
-            # 1. Ensure columns exist
-            required_cols = ["Time", "X", "Y"]
-            if not all(col in telemetry.columns for col in required_cols):
-                # print(f" [Skipping {driver}: Missing columns]") 
-                continue
-
-            # 2. Handle LapNumber (Fill missing with 0 or previous)
-            if "LapNumber" not in telemetry.columns:
-                telemetry["LapNumber"] = 0
-            else:
-                telemetry["LapNumber"] = telemetry["LapNumber"].ffill().fillna(0)
-            
-            # 3. Filter Columns
-            telemetry = telemetry[["Time", "X", "Y", "LapNumber"]]
-            
-            # 4. Drop ONLY if coordinates/time are missing (Keep LapNumber even if 0)
-            telemetry = telemetry.dropna(subset=["Time", "X", "Y"])
-            
-            # FIX 4: Sort by Time to ensure linear progression
-            telemetry.sort_values(by="Time", inplace=True)
-            
-            # FIX 9: Handle datasets with insufficient data for interpolation
-            if len(telemetry) < 2:
-                continue
-            
-            # UNIT FIX: Convert Decimeters to Meters
-            telemetry["X"] = telemetry["X"] / 10.0
-            telemetry["Y"] = telemetry["Y"] / 10.0
-            
-            # Normalize Time
-            telemetry["Time"] = telemetry["Time"].dt.total_seconds()
-            telemetry.reset_index(drop=True, inplace=True)
-            
+    drivers_data = {}
+    driver_info = metadata["driver_info"]
+    # Bounds are folded in per driver as each one arrives, never over all samples at once
+    bounds = robust_bounds = None
+    started = time.perf_counter()
+    for driver, info, telemetry in iter_drivers(session, workers=workers):
+        if info is not None:
+            driver_info[driver] = info
+        if telemetry is not None:
+            # Converted one driver at a time, so the float64 frames never coexist
+            if compact:
+                telemetry = CompactTelemetry.from_frame(telemetry, time_unit)
             drivers_data[driver] = telemetry
-            
-        except Exception as e:
-            print(f"\n⚠️ Warning: skipped driver {driver} due to error: {e}")
-            continue
+            bounds = merge_bounds(bounds, driver_bounds(telemetry))
+            robust_bounds = merge_bounds(robust_bounds, driver_bounds(telemetry, BOUNDS_CLIP_PERCENT))
+            yield ("driver", driver, info, telemetry)
+    elapsed = time.perf_counter() - started
+    metadata["track_length"] = estimate_track_length(
+        [np.asarray(df["CumDist"])[-1] for df in drivers_data.values()], total_laps
+    )
 
-    print("\n✅ Telemetry processing complete.")
+    print(f"\n✅ Telemetry processing complete ({elapsed:.1f}s, {_describe_workers(workers)}).")
     
     if not drivers_data:
         print("\n❌ ERROR: No valid driver data could be loaded. The session might be empty or incompatible.")
-        sys.exit(1)
+        raise RaceLoadError(year, race_name, "drivers", "no valid driver data")
     
-    bounds = compute_bounds(drivers_data)
     timeline = build_global_timeline(drivers_data)
     
-    return {
+    race_data = {
         "drivers": drivers_data,
         "track": {
-            "bounds": bounds,
+            "bounds": bounds or EMPTY_BOUNDS,
+            "robust_bounds": robust_bounds or EMPTY_BOUNDS,
             "timeline": timeline
         },
-        "metadata": {
-            "year": year,
-            "race_name": session.event["EventName"],
-            "session": session.name,
-            "total_laps": total_laps,
-            "driver_info": driver_info
-        }
+        "metadata": metadata
     }
 
-def compute_bounds(drivers_data):
-    xs, ys = [], []
+    if use_cache:
+        try:
+            save_session(race_data, cache_path)
+        except OSError as e:
+            print(f"⚠️ Warning: could not write session cache: {e}")
+
+    yield ("done", race_data)
+
+def load_cached_race(cache_path, compact=False, time_unit="s"):
+    """
+    Reads a session cache entry in load_race's return shape (None on a miss).
+    With compact=True the frames are converted and dropped, and the timeline is
+    rebuilt from the converted drivers so nothing refers to the float64 frames.
+    """
+    cached = load_session(cache_path)
+    if cached is not None and compact:
+        cached["drivers"] = compact_drivers(cached["drivers"], time_unit)
+        cached["track"]["timeline"] = build_global_timeline(cached["drivers"])
+    return cached
+
+# Session handed to forked extraction workers
+_SESSION = None
+
+def iter_drivers(session, workers=1, pool="process"):
+    """
+    Yields (driver, info, telemetry) per driver; either is None for skipped drivers.
+    workers > 1 runs drivers concurrently in a process pool (forked, so the session
+    is shared without pickling) or a thread pool. Output order follows session.drivers
+    either way, and drivers are skipped with the same warnings as the serial path.
+    The process pool is only forked from a single-threaded process; otherwise (e.g. the
+    streaming loader's background thread, or the schedule index still fetching) threads
+    are used, since a forked child could inherit a lock another thread was holding.
+    """
+    global _SESSION
+    drivers_list = list(session.drivers)
+    total_drivers = len(drivers_list)
+
+    if workers > 1 and pool == "process" and not _can_fork():
+        pool = "thread"
+
+    if workers <= 1:
+        results = (_extract_driver(session, driver) for driver in drivers_list)
+        executor = None
+    elif pool == "process":
+        # Forked workers inherit the loaded session through this module global
+        _SESSION = session
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+        results = executor.map(_extract_forked_driver, drivers_list)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        results = executor.map(lambda driver: _extract_driver(session, driver), drivers_list)
+
+    try:
+        for i, (driver, (info, telemetry)) in enumerate(zip(drivers_list, results)):
+            sys.stdout.write(f"\r   Processing driver {i+1}/{total_drivers} ({driver})")
+            sys.stdout.flush()
+            yield driver, info, telemetry
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        _SESSION = None
+
+def extract_drivers(session, workers=1, pool="process"):
+    """
+    Builds the cleaned per-driver frames and driver metadata for a loaded session.
+    Returns (drivers_data, driver_info); see iter_drivers for the worker options.
+    """
+    drivers_data = {}
+    driver_info = {}
+    for driver, info, telemetry in iter_drivers(session, workers=workers, pool=pool):
+        if info is not None:
+            driver_info[driver] = info
+        if telemetry is not None:
+            drivers_data[driver] = telemetry
+    return drivers_data, driver_info
+
+def _can_fork():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return False
+    return threading.current_thread() is threading.main_thread() and threading.active_count() == 1
+
+def _extract_forked_driver(driver):
+    return _extract_driver(_SESSION, driver)
+
+def _describe_workers(workers):
+    return f"{workers} workers" if workers > 1 else "serial"
+
+def _extract_driver(session, driver):
+    """
+    Returns (driver_info, telemetry) for one driver; either is None when skipped.
+    """
+    info = None
+    try:
+        laps = session.laps.pick_drivers(driver)
+        if laps.empty:
+            return None, None
+        
+        # Extract Metadata
+        drv_details = session.get_driver(driver)
+        color = drv_details.get("TeamColor", "CCCCCC")
+        if not color or color == "": color = "CCCCCC"
+            
+        info = {
+            "Abbreviation": drv_details["Abbreviation"],
+            "TeamColor": f"#{color}",
+            "TeamName": drv_details["TeamName"]
+        }
+        
+        # Extract Telemetry
+        telemetry = laps.get_telemetry()
+        
+        # --- ROBUST DATA CLEANING ---
+        # 1. Ensure columns exist
+        required_cols = ["Time", "X", "Y"]
+        if not all(col in telemetry.columns for col in required_cols):
+            # print(f" [Skipping {driver}: Missing columns]") 
+            return info, None
+
+        # 2. Handle LapNumber (Fill missing with 0 or previous)
+        if "LapNumber" not in telemetry.columns:
+            telemetry["LapNumber"] = 0
+        else:
+            telemetry["LapNumber"] = telemetry["LapNumber"].ffill().fillna(0)
+        
+        # 3. Filter Columns
+        telemetry = telemetry[["Time", "X", "Y", "LapNumber"]]
+        
+        # 4. Drop ONLY if coordinates/time are missing (Keep LapNumber even if 0)
+        telemetry = telemetry.dropna(subset=["Time", "X", "Y"])
+        
+        # FIX 4: Sort by Time to ensure linear progression
+        telemetry.sort_values(by="Time", inplace=True)
+        
+        # FIX 9: Handle datasets with insufficient data for interpolation
+        if len(telemetry) < 2:
+            return info, None
+        
+        # UNIT FIX: Convert Decimeters to Meters
+        telemetry["X"] = telemetry["X"] / 10.0
+        telemetry["Y"] = telemetry["Y"] / 10.0
+        
+        # Normalize Time
+        telemetry["Time"] = telemetry["Time"].dt.total_seconds()
+        telemetry.reset_index(drop=True, inplace=True)
+        
+        # 5. Distance travelled, in total and since the start of the current lap
+        telemetry["CumDist"] = cumulative_distance(telemetry["X"].values, telemetry["Y"].values)
+        telemetry["LapDist"] = lap_distance(telemetry["CumDist"].values, telemetry["LapNumber"].values)
+        
+        return info, telemetry
+        
+    except Exception as e:
+        print(f"\n⚠️ Warning: skipped driver {driver} due to error: {e}")
+        return info, None
+
+def load_race_mapped(year: int, race_name: str, use_cache: bool = True, workers: int = 1):
+    """
+    Like load_race, but "drivers" is a PackedReplayState backed by a memory-mapped
+    store, so only the pages a replay actually touches stay resident.
+    """
+    path = store_path(year, race_name)
+    mapped = open_store(path)
+    if mapped is not None:
+        print(f"⚡ Mapped telemetry store {path}.bin")
+        return mapped
+
+    race_data = load_race(year, race_name, use_cache=use_cache, workers=workers)
+    write_store(race_data, path)
+    # Drop the in-memory frames; the replay reads from the mapping from here on
+    del race_data
+    return open_store(path)
+
+def compute_bounds(drivers_data, clip_percent=None):
+    """
+    (min_x, max_x, min_y, max_y) over every driver, folded one driver at a time.
+    With clip_percent, each driver's extremes are percentiles instead (see driver_bounds).
+    """
+    bounds = None
     for telemetry in drivers_data.values():
-        if not telemetry.empty:
-            xs.extend(telemetry["X"].values)
-            ys.extend(telemetry["Y"].values)
+        bounds = merge_bounds(bounds, driver_bounds(telemetry, clip_percent))
+    return bounds or EMPTY_BOUNDS
+
+def driver_bounds(telemetry, clip_percent=None):
+    """
+    One driver's (min_x, max_x, min_y, max_y), or None without finite samples.
+    clip_percent ignores that percentage of samples at each end of each axis,
+    so a few bad positions cannot stretch the box.
+    """
+    x = np.asarray(telemetry["X"], dtype=np.float64)
+    y = np.asarray(telemetry["Y"], dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.any():
+        return None
+    x, y = x[finite], y[finite]
+
+    if clip_percent:
+        x_lo, x_hi = np.percentile(x, [clip_percent, 100 - clip_percent])
+        y_lo, y_hi = np.percentile(y, [clip_percent, 100 - clip_percent])
+        return float(x_lo), float(x_hi), float(y_lo), float(y_hi)
+    return float(x.min()), float(x.max()), float(y.min()), float(y.max())
+
+def lap_distance(cum_dist, lap_numbers):
+    """
+    Distance since the first sample of the current lap (resets whenever LapNumber changes).
+    """
+    cum_dist = np.asarray(cum_dist, dtype=np.float64)
+    lap_numbers = np.asarray(lap_numbers)
+    if len(cum_dist) == 0:
+        return cum_dist
+    lap_start = np.zeros(len(cum_dist), dtype=np.int64)
+    changed = np.flatnonzero(lap_numbers[1:] != lap_numbers[:-1]) + 1
+    lap_start[changed] = changed
+    np.maximum.accumulate(lap_start, out=lap_start)
+    return cum_dist - cum_dist[lap_start]
+
+def estimate_track_length(total_distances, total_laps):
+    """
+    Approximate lap length from the furthest distance any driver covered (usually the winner).
+    """
+    # FIX 1: Estimate Track Length dynamically for Lap Calculation
+    max_total_dist = max((float(d) for d in total_distances), default=0)
     
-    if not xs: return (0, 100, 0, 100)
-    return min(xs), max(xs), min(ys), max(ys)
+    # If total_laps is valid AND distance is valid, calculate approx track length. 
+    # Otherwise default to 5000m. Prevents 0 division.
+    if total_laps > 0 and max_total_dist > 0:
+        return max_total_dist / total_laps
+    return 5000
+
+def merge_bounds(a, b):
+    """
+    Smallest (min_x, max_x, min_y, max_y) box covering both a and b (either may be None).
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
 
 def build_global_timeline(drivers_data):
-    times = set()
-    for telemetry in drivers_data.values():
-        if not telemetry.empty:
-            times.update(telemetry["Time"].values)
-    return sorted(list(times))
\ No newline at end of file
+    """
+    Returns a Timeline over every driver's samples. Only start and end are kept;
+    the merged array of all timestamps is built on request by Timeline.merged_times.
+    """
+    return Timeline.from_frames(drivers_data)
+
+# Channels of the resampled grid, in the order of its last axis
+RESAMPLE_CHANNELS = ("X", "Y", "CumDist", "LapNumber")
+
+class ResampledRace:
+    """
+    Every driver on one shared uniform time grid, as a (driver, frame, channel)
+    float32 array. Frame i is at start + i / rate_hz for all drivers, so playback,
+    analytics and export can index by integer frame instead of searching.
+    """
+
+    def __init__(self, driver_ids, data, start, rate_hz):
+        self.driver_ids = list(driver_ids)
+        self.data = data
+        self.start = float(start)
+        self.rate_hz = float(rate_hz)
+
+    @property
+    def n_frames(self):
+        return self.data.shape[1]
+
+    @property
+    def times(self):
+        return self.start + np.arange(self.n_frames) / self.rate_hz
+
+    def channel(self, name):
+        """
+        (driver, frame) view of one channel.
+        """
+        return self.data[:, :, RESAMPLE_CHANNELS.index(name)]
+
+    def frame_index(self, t):
+        i = int(round((t - self.start) * self.rate_hz))
+        return min(max(i, 0), self.n_frames - 1)
+
+    def to_state(self):
+        """
+        Repacks the grid as a PackedReplayState so the replay and exporter can use it.
+        Channels keep the compact dtypes (float32, LapNumber uint8); only Time is
+        float64, repeated per driver because the state searches each driver's rows.
+        """
+        n_drivers, n_frames = self.data.shape[:2]
+        columns = {"Time": np.tile(self.times, n_drivers)}
+        for name in RESAMPLE_CHANNELS:
+            columns[name] = self.channel(name).astype(COMPACT_DTYPES[name]).ravel()
+        offsets = np.arange(n_drivers) * n_frames
+        return PackedReplayState(self.driver_ids, columns, offsets, [n_frames] * n_drivers)
+
+def resample_race(drivers_data, rate_hz=10.0, timeline=None):
+    """
+    Puts every driver on a shared uniform grid at rate_hz between the timeline's
+    start and end. Positions and distance are linearly interpolated, laps are held
+    from the latest sample, and values are held flat before a driver's first and
+    after their last sample. Accepts {driver: frame} or a PackedReplayState.
+    """
+    if isinstance(drivers_data, PackedReplayState):
+        drivers_data = drivers_data.driver_views()
+    if timeline is None:
+        timeline = Timeline(np.asarray(t["Time"], dtype=np.float64) for t in drivers_data.values())
+
+    n_frames = int(np.floor(timeline.duration * rate_hz)) + 1
+    grid = timeline.start + np.arange(n_frames) / rate_hz
+
+    driver_ids = [drv for drv, t in drivers_data.items() if len(t["Time"]) > 0]
+    data = np.empty((len(driver_ids), n_frames, len(RESAMPLE_CHANNELS)), dtype=np.float32)
+
+    for k, drv in enumerate(driver_ids):
+        telemetry = drivers_data[drv]
+        times = np.asarray(telemetry["Time"], dtype=np.float64)
+        x = np.asarray(telemetry["X"], dtype=np.float64)
+        y = np.asarray(telemetry["Y"], dtype=np.float64)
+        if "CumDist" in telemetry:
+            cum_dist = np.asarray(telemetry["CumDist"], dtype=np.float64)
+        else:
+            cum_dist = cumulative_distance(x, y)
+
+        latest = np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(times) - 1)
+        data[k, :, 0] = np.interp(grid, times, x)
+        data[k, :, 1] = np.interp(grid, times, y)
+        data[k, :, 2] = np.interp(grid, times, cum_dist)
+        data[k, :, 3] = np.asarray(telemetry["LapNumber"], dtype=np.float64)[latest]
+
+    return ResampledRace(driver_ids, data, timeline.start, rate_hz)
@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Frames render with no window: SDL's dummy video driver needs no display server
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from replay import ReplayScene, TRAIL_LENGTH
+
+EXPORT_SIZE = (1280, 850)
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".avi")
+
+# Frames per worker task; each chunk also re-plays trail-length frames to rebuild trails
+CHUNK_FRAMES = 60
+
+# Parallel workers write raw chunks to spill files; the parent copies them in blocks this size
+SPILL_COPY_BYTES = 4 * 1024 * 1024
+
+# Per-process render state, set up once by _init_worker
+_SCENE = None
+_SCREEN = None
+_FRAME_TIMES = None
+_SPEED = 1.0
+
+def export_replay(race_data, output, fps=30, speed=1.0, start=None, end=None, workers=1,
+                  trail_length=TRAIL_LENGTH):
+    """
+    Renders the replay off-screen on a fixed timestep (speed race seconds per output
+    second) and writes it to `output`: a video file streamed through ffmpeg, a .rgb
+    raw RGB24 stream, or otherwise a directory of PNG frames.
+    workers > 1 renders consecutive time chunks in parallel processes; frames are
+    always written in order. Raw frames never collect in memory: the serial path
+    writes each one as it is rendered, and workers spill whole chunks to temporary
+    files that the parent streams into the output.
+    """
+    timeline = race_data["track"]["timeline"]
+    start = timeline[0] if start is None else max(timeline[0], start)
+    end = timeline[-1] if end is None else min(timeline[-1], end)
+    if end <= start:
+        print("❌ Export Error: empty time range.")
+        return
+
+    step = speed / fps
+    n_frames = int((end - start) / step) + 1
+    frame_times = [start + i * step for i in range(n_frames)]
+    chunks = [(first, min(first + CHUNK_FRAMES, n_frames)) for first in range(0, n_frames, CHUNK_FRAMES)]
+
+    mode = _output_mode(output)
+    sink, encoder = _open_sink(output, mode, fps)
+    print(f"🎬 Exporting {n_frames} frames ({mode}) to {output} with {workers} worker(s)...")
+
+    started = time.perf_counter()
+    done = 0
+    try:
+        if workers <= 1:
+            _init_worker(race_data, frame_times, speed, trail_length)
+            write = sink.write if sink is not None else None
+            for first, last in chunks:
+                done = _progress(done + _render_chunk(first, last, mode, output, write), n_frames)
+        else:
+            context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+            spill_dir = tempfile.mkdtemp(prefix=".export_", dir=os.path.dirname(os.path.abspath(output)))
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(race_data, frame_times, speed, trail_length)
+                ) as executor:
+                    # Keep a bounded window of chunks in flight so spill files never pile up
+                    pending = []
+                    queue = list(chunks)
+                    while queue or pending:
+                        while queue and len(pending) < workers * 2:
+                            first, last = queue.pop(0)
+                            spill = os.path.join(spill_dir, f"chunk_{first:06d}.rgb") if sink is not None else None
+                            pending.append(executor.submit(_render_chunk_file, first, last, mode, output, spill))
+                        frames, spill = pending.pop(0).result()
+                        if spill is not None:
+                            _drain_spill(spill, sink)
+                        done = _progress(done + frames, n_frames)
+            finally:
+                shutil.rmtree(spill_dir, ignore_errors=True)
+    finally:
+        if sink is not None:
+            sink.close()
+        if encoder is not None:
+            encoder.wait()
+
+    elapsed = time.perf_counter() - started
+    rendered_secs = n_frames * step
+    print(f"\n✅ Export complete: {n_frames} frames in {elapsed:.1f}s "
+          f"({n_frames / elapsed:.1f} fps, {rendered_secs / elapsed:.1f}x real time).")
+
+def _output_mode(output):
+    ext = os.path.splitext(output)[1].lower()
+    if ext in VIDEO_EXTENSIONS:
+        return "video"
+    if ext == ".rgb":
+        return "raw"
+    return "png"
+
+def _open_sink(output, mode, fps):
+    """
+    Returns (writable stream or None, encoder process or None) for the output mode.
+    """
+    if mode == "png":
+        os.makedirs(output, exist_ok=True)
+        return None, None
+    if mode == "raw":
+        return open(output, "wb"), None
+
+    if shutil.which("ffmpeg") is None:
+        print("❌ Export Error: ffmpeg not found on PATH (use a .rgb file or PNG directory instead).")
+        sys.exit(1)
+    width, height = EXPORT_SIZE
+    encoder = subprocess.Popen(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", output
+        ],
+        stdin=subprocess.PIPE
+    )
+    return encoder.stdin, encoder
+
+def _drain_spill(spill, sink):
+    with open(spill, "rb") as f:
+        shutil.copyfileobj(f, sink, SPILL_COPY_BYTES)
+    os.remove(spill)
+
+def _progress(done, n_frames):
+    sys.stdout.write(f"\r   Rendered frame {done}/{n_frames}")
+    sys.stdout.flush()
+    return done
+
+def _init_worker(race_data, frame_times, speed, trail_length):
+    global _SCENE, _SCREEN, _FRAME_TIMES, _SPEED
+    pygame.init()
+    _SCREEN = pygame.display.set_mode(EXPORT_SIZE)
+    _SCENE = ReplayScene(
+        race_data["drivers"],
+        race_data["track"]["bounds"],
+        race_data["track"]["timeline"],
+        race_data["metadata"],
+        EXPORT_SIZE,
+        trail_length
+    )
+    _FRAME_TIMES = frame_times
+    _SPEED = speed
+
+def _render_chunk_file(first, last, mode, output, spill):
+    """
+    Worker task: renders frames [first, last), writing raw RGB to the spill file
+    (None for PNG output). Returns (frame count, spill path or None).
+    """
+    if spill is None:
+        return _render_chunk(first, last, mode, output, None), None
+    with open(spill, "wb") as f:
+        return _render_chunk(first, last, mode, output, f.write), spill
+
+def _render_chunk(first, last, mode, output, write):
+    """
+    Renders frames [first, last), saving PNGs or passing each frame's raw RGB bytes
+    to write as soon as it is drawn. Returns the frame count.
+    """
+    scene, screen, times = _SCENE, _SCREEN, _FRAME_TIMES
+
+    # Replay the frames just before the chunk so trails match a continuous render
+    warmup = max(0, first - (scene.trail_length - 1))
+    scene.seek(times[warmup])
+    scene.clear_trails()
+    for i in range(warmup, first):
+        scene.update(times[i])
+
+    for i in range(first, last):
+        scene.draw(screen, times[i], _SPEED)
+        if mode == "png":
+            pygame.image.save(screen, os.path.join(output, f"frame_{i:06d}.png"))
+        else:
+            write(pygame.image.tobytes(screen, "RGB"))
+    return last - first
@@ -0,0 +1,77 @@
+import numpy as np
+
+def simplify_polyline(points, tolerance):
+    """
+    Ramer–Douglas–Peucker decimation: drops points that lie within `tolerance`
+    of the simplified line. Returns an (N, 2) float array that keeps both ends.
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(pts) < 3 or tolerance <= 0:
+        return pts
+
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Explicit stack instead of recursion: full-race traces run to tens of thousands of points
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        inner = pts[first + 1:last]
+        start = pts[first]
+        direction = pts[last] - start
+        length = np.hypot(direction[0], direction[1])
+        if length == 0:
+            dists = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            # Perpendicular distance from each inner point to the chord first -> last
+            cross = direction[0] * (inner[:, 1] - start[1]) - direction[1] * (inner[:, 0] - start[0])
+            dists = np.abs(cross) / length
+
+        i = int(np.argmax(dists))
+        if dists[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return pts[keep]
+
+class Projection:
+    """
+    Maps world coordinates (metres) to screen pixels for one bounds/window size.
+    The padding, available area and ranges are computed once; apply() transforms
+    whole X/Y arrays in a single NumPy operation.
+    """
+    PADDING_X = 60
+    PADDING_Y = 90
+    SIDEBAR_WIDTH = 240
+
+    def __init__(self, bounds, screen_size):
+        self.bounds = tuple(bounds)
+        self.screen_size = tuple(screen_size)
+        self.min_x, max_x, self.min_y, max_y = bounds
+        width, self.height = screen_size
+
+        self.avail_w = width - (self.PADDING_X * 2) - self.SIDEBAR_WIDTH
+        self.avail_h = self.height - (self.PADDING_Y * 2)
+
+        # FIX 3: Division by Zero Protection
+        self.range_x = max(1.0, max_x - self.min_x)
+        self.range_y = max(1.0, max_y - self.min_y)
+
+    def apply(self, xs, ys):
+        """
+        Returns integer screen (sx, sy) arrays for world (xs, ys) arrays.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        sx = ((xs - self.min_x) / self.range_x * self.avail_w).astype(np.int64) + self.PADDING_X
+        sy = ((ys - self.min_y) / self.range_y * self.avail_h).astype(np.int64) + self.PADDING_Y
+        return sx, self.height - sy
+
+    def point(self, x, y):
+        sx, sy = self.apply(x, y)
+        return int(sx), int(sy)
@@ -0,0 +1,76 @@
+import threading
+from data_loader import stream_race, compute_bounds, build_global_timeline, BOUNDS_CLIP_PERCENT
+
+class StreamingRaceLoader:
+    """
+    Runs stream_race on a background thread so the replay can open as soon as the
+    first driver is ready. The replay calls drain() each frame to collect new drivers.
+    """
+
+    def __init__(self, year, race_name, use_cache=True, workers=1, compact=False, time_unit="s"):
+        self.metadata = None
+        # Full load_race result, set once every driver has been processed
+        self.race_data = None
+        self.error = None
+        self.done = False
+        self._pending = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(year, race_name, use_cache, workers, compact, time_unit),
+            daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, year, race_name, use_cache, workers, compact, time_unit):
+        try:
+            for event in stream_race(year, race_name, use_cache=use_cache, workers=workers,
+                                     compact=compact, time_unit=time_unit):
+                if event[0] == "metadata":
+                    self.metadata = event[1]
+                elif event[0] == "driver":
+                    with self._lock:
+                        self._pending.append(event[1:])
+                    self._ready.set()
+                elif event[0] == "done":
+                    self.race_data = event[1]
+        except BaseException as e:
+            # Keep fatal errors (RaceLoadError and anything unexpected) for the main thread
+            self.error = e
+        finally:
+            self.done = True
+            self._ready.set()
+
+    def drain(self):
+        """
+        Returns the (driver, info, telemetry) tuples that arrived since the last call.
+        """
+        with self._lock:
+            arrived, self._pending = self._pending, []
+        return arrived
+
+    def wait_for_first_driver(self, timeout=None):
+        """
+        Blocks until at least one driver is ready (or loading ended) and returns the
+        drivers so far in load_race's shape. Returns None if loading failed first.
+        """
+        self._ready.wait(timeout)
+        arrived = self.drain()
+        if not arrived:
+            return None
+
+        drivers_data = {drv: telemetry for drv, _, telemetry in arrived}
+        metadata = dict(self.metadata, driver_info={drv: info for drv, info, _ in arrived})
+        return {
+            "drivers": drivers_data,
+            "track": {
+                "bounds": compute_bounds(drivers_data),
+                "robust_bounds": compute_bounds(drivers_data, BOUNDS_CLIP_PERCENT),
+                "timeline": build_global_timeline(drivers_data)
+            },
+            "metadata": metadata
+        }
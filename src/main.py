@@ -1,8 +1,11 @@
 import argparse
 import sys
-from data_loader import load_race
-from replay import run_replay
+from data_loader import load_race, load_race_mapped, resample_race, RaceLoadError, BOUNDS_CLIP_PERCENT
+from live_loader import StreamingRaceLoader
+from replay import run_replay, pack_race, TRAIL_LENGTH
 from menu import run_menu, run_year_menu
+from prefetch import RacePrefetcher
+from timeline import Timeline
 
 def main():
     # 1. Setup CLI
@@ -13,6 +16,69 @@ def main():
         default=None, 
         help="The race season year (Optional. Launches menu if omitted)"
     )
+    parser.add_argument(
+        "--race",
+        default=None,
+        help="The race name, e.g. 'Monaco Grand Prix' (Optional. Launches menu if omitted)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore and do not write the preprocessed session cache"
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Replay from a memory-mapped telemetry store to bound resident memory"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parallel workers for per-driver telemetry extraction (default: serial)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Open the replay as soon as the first driver is ready and add the rest as they load"
+    )
+    parser.add_argument(
+        "--compact",
+        nargs="?",
+        const="s",
+        default=None,
+        choices=["s", "ms"],
+        help="Keep telemetry as float32/uint8 arrays; Time in float64 seconds (default) or int32 ms"
+    )
+    parser.add_argument(
+        "--robust-bounds",
+        action="store_true",
+        help="Fit the track view to percentile-clipped bounds so stray GPS samples cannot shrink it"
+    )
+    parser.add_argument(
+        "--resample-hz",
+        type=float,
+        default=None,
+        help="Resample all drivers onto a shared uniform grid at this rate (e.g. 10, 4, 1) before replay/export"
+    )
+    parser.add_argument(
+        "--export",
+        metavar="PATH",
+        default=None,
+        help="Render headlessly to a video (.mp4/.mkv/.mov/.webm/.avi), a raw .rgb stream or a PNG directory"
+    )
+    parser.add_argument("--trail-length", type=int, default=TRAIL_LENGTH, help="Positions kept in each car's trail")
+    parser.add_argument("--fps", type=int, default=30, help="Frames per second for --export")
+    parser.add_argument("--speed", type=float, default=1.0, help="Race seconds per video second for --export")
+    parser.add_argument("--start", type=float, default=None, help="Session time (s) to start --export from")
+    parser.add_argument("--end", type=float, default=None, help="Session time (s) to end --export at")
+    parser.add_argument("--export-workers", type=int, default=1, help="Render processes for --export")
+    parser.add_argument(
+        "--profile-csv",
+        metavar="PATH",
+        default=None,
+        help="Write per-frame replay timings (ms per span) to this CSV file"
+    )
     args = parser.parse_args()
 
     # 2. Select Year (CLI or Menu)
@@ -28,19 +94,91 @@ def main():
         print("❌ No year selected. Exiting.")
         sys.exit(0)
 
-    # 3. Select Race (Menu)
-    try:
-        race_name = run_menu(year)
-    except Exception as e:
-        print(f"❌ Error in race menu: {e}")
-        sys.exit(1)
+    # 3. Select Race (CLI or Menu)
+    race_name = args.race
+    if race_name is None:
+        # Races the menu selection rests on are loaded into the session cache in the background
+        prefetcher = None if args.no_cache else RacePrefetcher()
+        try:
+            race_name = run_menu(year, prefetcher=prefetcher)
+        except Exception as e:
+            print(f"❌ Error in race menu: {e}")
+            sys.exit(1)
+        finally:
+            if prefetcher is not None:
+                if race_name:
+                    prefetcher.finish(year, race_name)
+                else:
+                    prefetcher.cancel_all()
         
     if not race_name:
         print("❌ No race selected. Exiting.")
         sys.exit(0)
 
-    # 4. Load Data & Run Replay
-    race_data = load_race(year, race_name)
+    # 4. Load Data
+    live = None
+    if args.stream and not args.export:
+        live = StreamingRaceLoader(
+            year, race_name,
+            use_cache=not args.no_cache,
+            workers=args.workers,
+            compact=args.compact is not None,
+            time_unit=args.compact or "s"
+        ).start()
+        race_data = live.wait_for_first_driver()
+        if race_data is None:
+            # RaceLoadError has already been reported by the loader
+            if not isinstance(live.error, RaceLoadError):
+                print(f"❌ Error loading race: {live.error}")
+            sys.exit(1)
+    else:
+        try:
+            if args.mmap:
+                race_data = load_race_mapped(year, race_name, use_cache=not args.no_cache, workers=args.workers)
+            else:
+                race_data = load_race(
+                    year, race_name,
+                    use_cache=not args.no_cache,
+                    workers=args.workers,
+                    compact=args.compact is not None,
+                    time_unit=args.compact or "s"
+                )
+        except RaceLoadError:
+            sys.exit(1)
+
+    if args.robust_bounds:
+        race_data["track"]["bounds"] = race_data["track"].get("robust_bounds", race_data["track"]["bounds"])
+
+    # Streaming drivers arrive after the grid would be built, so resampling skips them
+    if args.resample_hz and live is None:
+        resampled = resample_race(race_data["drivers"], args.resample_hz, race_data["track"]["timeline"])
+        print(f"📐 Resampled to {args.resample_hz:g} Hz: {resampled.n_frames} frames x {len(resampled.driver_ids)} drivers")
+        race_data["drivers"] = resampled.to_state()
+        # to_state() copies every channel; the grid itself is not needed past this point
+        del resampled
+        # Replace the full-resolution frames' timeline too, so nothing keeps them alive
+        race_data["track"]["timeline"] = Timeline.from_state(race_data["drivers"])
+
+    # Only streamed replays add drivers later; everything else packs once and drops the frames
+    if live is None:
+        pack_race(race_data)
+
+    # 5. Export (headless) or Run Replay
+    if args.export:
+        # Imported here: export switches SDL to its dummy (no window) video driver
+        from export import export_replay
+
+        export_replay(
+            race_data,
+            args.export,
+            fps=args.fps,
+            speed=args.speed,
+            start=args.start,
+            end=args.end,
+            workers=args.export_workers,
+            trail_length=args.trail_length
+        )
+        return
 
     try:
         # Pass full metadata object so replay.py can use dynamic values
@@ -48,7 +186,11 @@ def main():
             race_data["drivers"],
             race_data["track"]["bounds"],
             race_data["track"]["timeline"],
-            race_data["metadata"]
+            race_data["metadata"],
+            live=live,
+            profile_csv=args.profile_csv,
+            bounds_clip=BOUNDS_CLIP_PERCENT if args.robust_bounds else None,
+            trail_length=args.trail_length
         )
     except Exception as e:
         print(f"❌ Critical Error running simulation: {e}")
@@ -1,6 +1,6 @@
 import pygame
 import sys
-import fastf1
+from schedule_index import ScheduleIndex, SEASON_YEARS
 
 # --- Menu Visual Configuration ---
 BG_COLOR = (13, 13, 17)
@@ -10,6 +10,15 @@ TEXT_COLOR = (220, 220, 220)
 ACCENT_COLOR = (100, 200, 255)
 SUBTEXT_COLOR = (120, 120, 120)
 
+# Shared by both menus: the year menu starts refreshing it, the race menu reads it
+_SCHEDULES = None
+
+def get_schedule_index():
+    global _SCHEDULES
+    if _SCHEDULES is None:
+        _SCHEDULES = ScheduleIndex()
+    return _SCHEDULES
+
 def draw_list(screen, font_item, font_small, title_str, items, selected_idx, scroll_offset, visible_items, list_start_y):
     screen_w, screen_h = screen.get_size()
     
@@ -93,7 +102,10 @@ def run_year_menu():
     font_small = pygame.font.SysFont("Arial", 14)
     
     # Generate Years (2025 down to 2018)
-    years = [{"label": str(y), "sub": "Season"} for y in range(2025, 2017, -1)]
+    years = [{"label": str(y), "sub": "Season"} for y in SEASON_YEARS]
+
+    # Fetch any missing calendars in the background while the user picks a year
+    get_schedule_index().refresh(SEASON_YEARS)
     
     selected_idx = 0
     scroll_offset = 0
@@ -123,9 +135,10 @@ def run_year_menu():
         pygame.display.flip()
         clock.tick(60)
 
-def run_menu(year):
+def run_menu(year, prefetcher=None):
     """
     Displays a graphical menu to select a race from the given year.
+    With a RacePrefetcher, the race the selection rests on is loaded in the background.
     """
     pygame.init()
     screen = pygame.display.set_mode((900, 700))
@@ -136,26 +149,28 @@ def run_menu(year):
     font_item = pygame.font.SysFont("Consolas", 20)
     font_small = pygame.font.SysFont("Arial", 14)
     
-    # Loading Screen
-    screen.fill(BG_COLOR)
-    loading_surf = font_title.render(f"Fetching {year} Schedule...", True, TEXT_COLOR)
-    screen.blit(loading_surf, (450 - loading_surf.get_width()//2, 350))
-    pygame.display.flip()
-    
-    fastf1.Cache.enable_cache("cache")
-    try:
-        schedule = fastf1.get_event_schedule(year, include_testing=False)
-        races = []
-        for i, row in schedule.iterrows():
-            loc = row.get("Location", "Unknown")
-            date = row.get("EventDate").strftime('%d %b') if hasattr(row.get("EventDate"), 'strftime') else str(row.get("EventDate"))
-            races.append({
-                "label": row.get("EventName", "Unknown GP"),
-                "sub": f"R{row.get('RoundNumber', i)} | {loc} | {date}"
-            })
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
+    # Calendars come from the local schedule index; only a season that was never
+    # fetched shows the loading screen, and events keep being pumped meanwhile
+    schedules = get_schedule_index()
+    races = schedules.get(year)
+    if races is None:
+        schedules.request(year)
+    else:
+        schedules.refresh([year])
+    while races is None:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit(); sys.exit()
+        if year in schedules.errors:
+            print(f"Error: {schedules.errors[year]}")
+            return None
+
+        screen.fill(BG_COLOR)
+        loading_surf = font_title.render(f"Fetching {year} Schedule...", True, TEXT_COLOR)
+        screen.blit(loading_surf, (450 - loading_surf.get_width()//2, 350))
+        pygame.display.flip()
+        clock.tick(30)
+        races = schedules.get(year)
 
     if not races: return None
 
@@ -181,8 +196,12 @@ def run_menu(year):
                     pygame.display.quit()
                     return races[selected_idx]["label"]
                 if event.key == pygame.K_ESCAPE:
+                    if prefetcher is not None: prefetcher.cancel_all()
                     pygame.quit(); sys.exit()
 
+        if prefetcher is not None:
+            prefetcher.hover(year, races[selected_idx]["label"])
+
         draw_list(screen, font_item, font_small, f"SEASON {year} CALENDAR", races, selected_idx, scroll_offset, visible_items, 110)
         pygame.display.flip()
         clock.tick(60)
\ No newline at end of file
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import sys
+import time
+from session_cache import session_cache_path
+
+# How long the menu selection must rest on a race before it is prefetched
+PREFETCH_DWELL = 0.75
+
+# Races being prefetched at once; starting another cancels the oldest
+MAX_IN_FLIGHT = 2
+
+# Longest finish() waits on the chosen race's prefetch before loading it normally
+FINISH_TIMEOUT = 120
+
+class RacePrefetcher:
+    """
+    Speculatively loads the race under the menu cursor into the session cache, so
+    load_race hits the cache once the user confirms it.
+    Each prefetch is its own process, which makes cancelling it a terminate(); the
+    session cache is written atomically, so a cancelled prefetch leaves no entry.
+    Processes are spawned, not forked: the menu process runs the schedule index's
+    background thread, and a fork could inherit one of its locks held.
+    """
+
+    def __init__(self, dwell=PREFETCH_DWELL, max_in_flight=MAX_IN_FLIGHT):
+        self.dwell = dwell
+        self.max_in_flight = max(1, max_in_flight)
+        self._context = multiprocessing.get_context("spawn")
+        self._in_flight = {}
+        # Finished (or failed) prefetches are not retried; a failure resurfaces in load_race
+        self._attempted = set()
+        self._hovered = None
+        self._hover_started = 0.0
+
+    def hover(self, year, race_name):
+        """
+        Called every menu frame with the current selection; starts a prefetch once
+        the selection has rested on the same race for `dwell` seconds.
+        """
+        key = (year, race_name)
+        now = time.monotonic()
+        if key != self._hovered:
+            self._hovered = key
+            self._hover_started = now
+            return
+        if now - self._hover_started >= self.dwell:
+            self.start(year, race_name)
+
+    def start(self, year, race_name):
+        key = (year, race_name)
+        self._reap()
+        if key in self._attempted:
+            return
+        if os.path.exists(session_cache_path(year, race_name)):
+            self._attempted.add(key)
+            return
+
+        while len(self._in_flight) >= self.max_in_flight:
+            oldest = next(iter(self._in_flight))
+            self.cancel(*oldest)
+
+        process = self._context.Process(target=_prefetch_race, args=(year, race_name), daemon=True)
+        process.start()
+        self._in_flight[key] = process
+        self._attempted.add(key)
+
+    def cancel(self, year, race_name):
+        process = self._in_flight.pop((year, race_name), None)
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join()
+            self._attempted.discard((year, race_name))
+
+    def cancel_all(self):
+        for key in list(self._in_flight):
+            self.cancel(*key)
+
+    def finish(self, year, race_name, timeout=FINISH_TIMEOUT):
+        """
+        Cancels every other prefetch and waits up to timeout seconds for the chosen
+        race's, if one is running. Returns False when it had to be abandoned, in which
+        case load_race simply loads the race itself.
+        """
+        key = (year, race_name)
+        for other in list(self._in_flight):
+            if other != key:
+                self.cancel(*other)
+
+        process = self._in_flight.pop(key, None)
+        if process is not None and process.is_alive():
+            print(f"⏳ Finishing background prefetch of {year} {race_name}...")
+            process.join(timeout)
+            if process.is_alive():
+                print(f"⚠️ Prefetch still running after {timeout}s; loading the race directly instead.")
+                process.terminate()
+                process.join()
+                return False
+        return True
+
+    def _reap(self):
+        for key, process in list(self._in_flight.items()):
+            if not process.is_alive():
+                process.join()
+                del self._in_flight[key]
+
+def _prefetch_race(year, race_name):
+    # Keep the console clean while the menu is open; errors resurface in the real load
+    sys.stdout = open(os.devnull, "w")
+    from data_loader import load_race, RaceLoadError
+
+    try:
+        load_race(year, race_name, use_cache=True)
+    except RaceLoadError:
+        pass
@@ -0,0 +1,170 @@
+import csv
+import time
+import numpy as np
+import pygame
+
+# Frames kept for the rolling percentiles (10 s at 60 fps)
+PROFILE_WINDOW = 600
+
+# A frame counts as dropped when the time since the previous one exceeds this many budgets
+DROPPED_FRAME_FACTOR = 1.5
+
+# Percentiles are recomputed at most this often (seconds), not every frame
+OVERLAY_REFRESH = 0.5
+
+OVERLAY_BG = (0, 0, 0, 190)
+OVERLAY_TEXT = (120, 255, 160)
+OVERLAY_WARN = (255, 120, 90)
+
+class NullProfiler:
+    """
+    Stand-in with the FrameProfiler interface that records nothing (e.g. the exporter).
+    """
+    visible = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def skip_frame(self):
+        pass
+
+    def draw(self, screen, font):
+        pass
+
+    def close(self):
+        pass
+
+class FrameProfiler:
+    """
+    Per-frame timings of named spans in the replay loop.
+    Each mark(name) closes the span that began at the previous mark (or begin_frame),
+    so the spans of one frame partition its work time. Percentiles are over work time
+    (begin_frame to end_frame); dropped frames are judged on the full frame interval.
+    With csv_path every frame is appended as a row; the header lists the spans
+    registered up front or seen during the first frame.
+    """
+
+    def __init__(self, spans=(), target_fps=60, window=PROFILE_WINDOW, csv_path=None):
+        self.budget = 1.0 / target_fps
+        self.window = window
+        self.visible = False
+        self.dropped = 0
+        self.frames = 0
+        self.span_names = []
+        self._span_index = {}
+        self._history = np.zeros((window, 0))
+        self._totals = np.zeros(window)
+        self._current = []
+        self._frame_start = None
+        self._prev_start = None
+        self._last_mark = None
+        self._summary = None
+        self._summary_time = 0.0
+
+        for name in spans:
+            self._add_span(name)
+
+        self._csv_file = None
+        self._csv = None
+        if csv_path:
+            self._csv_file = open(csv_path, "w", newline="")
+            self._csv = csv.writer(self._csv_file)
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self._prev_start is not None and now - self._prev_start > self.budget * DROPPED_FRAME_FACTOR:
+            self.dropped += 1
+        self._prev_start = self._frame_start = self._last_mark = now
+        self._current = [0.0] * len(self.span_names)
+
+    def mark(self, name):
+        now = time.perf_counter()
+        i = self._span_index.get(name)
+        if i is None:
+            i = self._add_span(name)
+        self._current[i] += now - self._last_mark
+        self._last_mark = now
+
+    def _add_span(self, name):
+        i = len(self.span_names)
+        self.span_names.append(name)
+        self._span_index[name] = i
+        self._history = np.hstack([self._history, np.zeros((self.window, 1))])
+        self._current.append(0.0)
+        return i
+
+    def skip_frame(self):
+        """
+        Abandons the frame begun by begin_frame (e.g. nothing was rendered while paused);
+        the idle gap before the next frame is not counted as a dropped frame.
+        """
+        self._prev_start = None
+
+    def end_frame(self):
+        total = time.perf_counter() - self._frame_start
+        slot = self.frames % self.window
+        self._history[slot] = self._current
+        self._totals[slot] = total
+        self.frames += 1
+
+        if self._csv is not None:
+            if self.frames == 1:
+                self._csv.writerow(["frame", "total_ms"] + [f"{name}_ms" for name in self.span_names])
+            self._csv.writerow(
+                [self.frames, f"{total * 1000:.3f}"] + [f"{v * 1000:.3f}" for v in self._current]
+            )
+
+    def summary(self):
+        """
+        Returns {"p50", "p95", "p99", "spans": {name: mean seconds}} over the window.
+        """
+        n = min(self.frames, self.window)
+        if n == 0:
+            return None
+        p50, p95, p99 = np.percentile(self._totals[:n], [50, 95, 99])
+        means = self._history[:n].mean(axis=0)
+        return {
+            "p50": p50, "p95": p95, "p99": p99,
+            "spans": dict(zip(self.span_names, means))
+        }
+
+    def draw(self, screen, font):
+        """
+        Draws the overlay panel (top-left) when visible.
+        """
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if self._summary is None or now - self._summary_time > OVERLAY_REFRESH:
+            self._summary = self.summary()
+            self._summary_time = now
+        stats = self._summary
+        if stats is None:
+            return
+
+        lines = [
+            (f"frame p50 {stats['p50'] * 1000:5.2f}  p95 {stats['p95'] * 1000:5.2f}  p99 {stats['p99'] * 1000:5.2f} ms",
+             OVERLAY_WARN if stats["p95"] > self.budget else OVERLAY_TEXT),
+            (f"dropped {self.dropped} / {self.frames}", OVERLAY_WARN if self.dropped else OVERLAY_TEXT),
+        ]
+        for name, mean in stats["spans"].items():
+            lines.append((f"{name:<12} {mean * 1000:6.2f} ms", OVERLAY_TEXT))
+
+        surfaces = [font.render(text, True, color) for text, color in lines]
+        line_h = font.get_linesize()
+        panel = pygame.Surface((max(s.get_width() for s in surfaces) + 16, line_h * len(lines) + 12), pygame.SRCALPHA)
+        panel.fill(OVERLAY_BG)
+        for i, surf in enumerate(surfaces):
+            panel.blit(surf, (8, 6 + i * line_h))
+        screen.blit(panel, (10, 80))
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = self._csv = None
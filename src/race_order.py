@@ -0,0 +1,93 @@
+import numpy as np
+
+# Seconds between precomputed order/gap samples
+ORDER_STEP = 0.25
+
+# Grid points worked out together when playback first reaches them (60 s of race time)
+ORDER_WINDOW = 240
+
+class RaceOrderTimeline:
+    """
+    Race order, time gaps to the leader and the leader's lap on a fixed time grid,
+    so the replay does a constant-time lookup instead of a sort.
+
+    A driver's gap is how long after t they reach the distance the leader has
+    covered at t, found by inverting their own distance-over-time curve.
+
+    The grid is filled one window at a time, the first time a frame falls in it.
+    Each window binary-searches every driver for the rows it needs and reads only
+    those, so a memory-mapped state pages in just the part of the race being played.
+    """
+
+    def __init__(self, state, start, end, step=ORDER_STEP, window=ORDER_WINDOW):
+        self.state = state
+        self.start = float(start)
+        self.step = float(step)
+        self.window = int(window)
+        self.n_frames = max(1, int(np.floor((end - start) / step)) + 1)
+        # window index -> (order, gaps, leader_lap, leader_dist) for its grid points
+        self._windows = {}
+
+    def __len__(self):
+        return self.n_frames
+
+    def frame_index(self, t):
+        i = int(round((t - self.start) / self.step))
+        return min(max(i, 0), self.n_frames - 1)
+
+    def at(self, t):
+        """
+        Returns (order, gaps, leader_lap, leader_dist) for the grid point nearest t.
+        order holds driver indices into the state, leader first; gaps are per driver index.
+        """
+        w, j = divmod(self.frame_index(t), self.window)
+        block = self._windows.get(w)
+        if block is None:
+            block = self._windows[w] = self._compute_window(w)
+        order, gaps, leader_lap, leader_dist = block
+        return order[j], gaps[j], leader_lap[j], leader_dist[j]
+
+    def _compute_window(self, w):
+        state = self.state
+        first = w * self.window
+        grid = self.start + np.arange(first, min(first + self.window, self.n_frames)) * self.step
+        n_frames, n_drivers = len(grid), len(state)
+
+        dist = np.zeros((n_frames, n_drivers))
+        laps = np.zeros((n_frames, n_drivers))
+        driver_rows = []
+        for k, drv in enumerate(state.driver_ids):
+            rows = state.driver_slice(drv)
+            all_times = state.time[rows]
+            # The window's samples plus the ones bracketing it on either side
+            lo = max(np.searchsorted(all_times, grid[0], side="right") - 1, 0)
+            hi = min(np.searchsorted(all_times, grid[-1], side="left") + 1, len(all_times))
+            times = np.asarray(all_times[lo:hi], dtype=np.float64)
+            cum_dist = np.asarray(state.cum_dist[rows][lo:hi], dtype=np.float64)
+            dist[:, k] = np.interp(grid, times, cum_dist)
+            # Lap of the latest sample at or before each grid time (held at either end)
+            latest = np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(times) - 1)
+            laps[:, k] = state.lap[rows][lo:hi][latest]
+            driver_rows.append(rows)
+
+        # Leader first; stable so tied cars keep a consistent order
+        order = np.argsort(-dist, axis=1, kind="stable").astype(np.int16)
+        frames = np.arange(n_frames)
+        leader = order[:, 0]
+        leader_dist = dist[frames, leader]
+        leader_lap = laps[frames, leader]
+
+        gaps = np.zeros((n_frames, n_drivers), dtype=np.float32)
+        d_min, d_max = leader_dist.min(), leader_dist.max()
+        for k, rows in enumerate(driver_rows):
+            # Only the stretch of the curve spanning the leader's distances in this window
+            all_dist = state.cum_dist[rows]
+            lo = max(np.searchsorted(all_dist, d_min, side="right") - 1, 0)
+            hi = min(np.searchsorted(all_dist, d_max, side="left") + 1, len(all_dist))
+            cum_dist = np.asarray(all_dist[lo:hi], dtype=np.float64)
+            times = np.asarray(state.time[rows][lo:hi], dtype=np.float64)
+            # Never reaching the leader's distance (e.g. retired) gives an infinite gap
+            reached_at = np.interp(leader_dist, cum_dist, times, right=np.inf)
+            gaps[:, k] = np.maximum(reached_at - grid, 0.0)
+
+        return order, gaps, leader_lap, leader_dist
@@ -0,0 +1,224 @@
+import numpy as np
+import pygame
+from collections import OrderedDict
+from geometry import simplify_polyline
+
+# Pixel tolerance for decimating the track outline; sub-pixel detail is invisible
+TRACK_TOLERANCE_PX = 0.75
+
+# Rendered text surfaces kept by TextCache before the least recently used is dropped
+TEXT_CACHE_SIZE = 512
+
+# Width of the newest trail segment; older segments taper down to 1 px
+TRAIL_MAX_WIDTH = 4
+
+# Car marker: black rim, team-colour body and white centre radii, plus label placement
+MARKER_RADII = (9, 7, 2)
+MARKER_LABEL_OFFSET = (12, -12)
+MARKER_LABEL_COLOR = (220, 220, 220)
+
+class TextCache:
+    """
+    Bounded LRU of rendered text surfaces keyed by (font, text, colour).
+    Repeated labels are rasterized once; strings that change every frame
+    (clock, gaps) should be rendered directly so they do not churn the cache.
+    """
+
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            return surf
+
+        surf = font.render(text, True, color)
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+class TrackLayer:
+    """
+    Background plus track outline, rendered once onto an off-screen surface.
+    Each frame blits the cached surface instead of redrawing the polylines;
+    it is rebuilt only when the track points or the window size change.
+    """
+
+    def __init__(self, bg_color, outline_color, track_color, tolerance=TRACK_TOLERANCE_PX):
+        self.bg_color = bg_color
+        self.outline_color = outline_color
+        self.track_color = track_color
+        self.tolerance = tolerance
+        self.surface = None
+        self.points = []
+        self.size = None
+
+    def set_points(self, track_points):
+        """
+        Replaces the outline (e.g. after bounds change) and marks the layer stale.
+        """
+        self.points = simplify_polyline(track_points, self.tolerance).tolist()
+        self.surface = None
+
+    def draw(self, screen):
+        size = screen.get_size()
+        if self.surface is None or self.size != size:
+            self.surface = self._render(size)
+            self.size = size
+        screen.blit(self.surface, (0, 0))
+
+    def restore(self, screen, rects):
+        """
+        Repaints only the given screen rects from the cached layer (erasing what was drawn there).
+        """
+        size = screen.get_size()
+        if self.surface is None or self.size != size:
+            self.draw(screen)
+            return
+        for rect in rects:
+            screen.blit(self.surface, rect, rect)
+
+    def _render(self, size):
+        surface = pygame.Surface(size).convert()
+        surface.fill(self.bg_color)
+        if len(self.points) > 1:
+            pygame.draw.lines(surface, self.outline_color, False, self.points, 16)
+            pygame.draw.lines(surface, self.track_color, False, self.points, 6)
+        return surface
+
+class TrailBuffer:
+    """
+    Recent screen positions of every driver in one (drivers, length, 2) NumPy ring.
+    All drivers are pushed together, so they share a single head index; counts
+    track how much of each driver's history is valid (new or cleared drivers).
+    Drawing groups each trail's segments into runs of equal width, so the number
+    of draw calls per driver is bounded by TRAIL_MAX_WIDTH, not the trail length.
+    """
+
+    def __init__(self, n_trails, length):
+        self.length = max(2, int(length))
+        self.points = np.zeros((n_trails, self.length, 2), dtype=np.int32)
+        self.counts = np.zeros(n_trails, dtype=np.int64)
+        self.head = 0
+        self._runs = {}
+
+    def clear(self):
+        self.counts[:] = 0
+        self.head = 0
+
+    def push(self, xs, ys):
+        """
+        Appends one position per trail, overwriting the oldest once full.
+        """
+        self.points[:, self.head, 0] = xs
+        self.points[:, self.head, 1] = ys
+        self.head = (self.head + 1) % self.length
+        np.minimum(self.counts + 1, self.length, out=self.counts)
+
+    def reindex(self, old_ids, new_ids):
+        """
+        Carries each trail over to a new driver order; unseen drivers start empty.
+        """
+        old = {drv: k for k, drv in enumerate(old_ids)}
+        points = np.zeros((len(new_ids), self.length, 2), dtype=np.int32)
+        counts = np.zeros(len(new_ids), dtype=np.int64)
+        for k, drv in enumerate(new_ids):
+            j = old.get(drv)
+            if j is not None:
+                points[k] = self.points[j]
+                counts[k] = self.counts[j]
+        self.points, self.counts = points, counts
+
+    def _width_runs(self, n_points):
+        # (first segment, last segment, width) runs; segment i spans points i and i+1
+        runs = self._runs.get(n_points)
+        if runs is None:
+            runs = []
+            for i in range(n_points - 1):
+                width = max(1, int(TRAIL_MAX_WIDTH * (i / n_points)))
+                if runs and runs[-1][2] == width:
+                    runs[-1][1] = i
+                else:
+                    runs.append([i, i, width])
+            self._runs[n_points] = runs
+        return runs
+
+    def draw(self, screen, indices, colors):
+        """
+        Draws the trails of the given driver indices, oldest point first.
+        Returns one rect per drawn trail covering every pixel it touched.
+        """
+        rects = []
+        # Oldest-to-newest slot order, shared by every trail
+        ordered = self.points[:, (self.head + np.arange(self.length)) % self.length]
+        for k, color in zip(indices, colors):
+            count = int(self.counts[k])
+            if count < 2:
+                continue
+            pts = ordered[k, self.length - count:]
+            drawn = [
+                pygame.draw.lines(screen, color, False, pts[first:last + 2], width)
+                for first, last, width in self._width_runs(count)
+            ]
+            rects.append(drawn[0].unionall(drawn[1:]))
+        return rects
+
+class MarkerSprites:
+    """
+    Pre-composited car markers: the three marker circles and the driver's label on
+    one transparent surface, built once per (colour, label) and drawn for every car
+    with a single Surface.blits call.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self._sprites = {}
+
+    def sprite(self, color, label):
+        """
+        Returns (surface, (dx, dy)): blit at the car's screen position plus (dx, dy).
+        """
+        key = (color, label)
+        entry = self._sprites.get(key)
+        if entry is None:
+            entry = self._render(color, label)
+            self._sprites[key] = entry
+        return entry
+
+    def _render(self, color, label):
+        rim = MARKER_RADII[0]
+        text = self.font.render(label, True, MARKER_LABEL_COLOR)
+        lx, ly = MARKER_LABEL_OFFSET
+
+        # Box covering the circle and the label, relative to the car position
+        left, top = -rim, min(-rim, ly)
+        right = max(rim + 1, lx + text.get_width())
+        bottom = max(rim + 1, ly + text.get_height())
+
+        surface = pygame.Surface((right - left, bottom - top), pygame.SRCALPHA)
+        center = (-left, -top)
+        for radius, fill in zip(MARKER_RADII, ((0, 0, 0), color, (255, 255, 255))):
+            pygame.draw.circle(surface, fill, center, radius)
+        surface.blit(text, (lx - left, ly - top))
+
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        return surface, (left, top)
+
+    def draw(self, screen, cars):
+        """
+        cars: iterable of (colour, label, x, y), drawn in order (later ones on top).
+        Returns the rect each sprite was drawn to.
+        """
+        batch = []
+        for color, label, x, y in cars:
+            surface, (dx, dy) = self.sprite(color, label)
+            batch.append((surface, (x + dx, y + dy)))
+        return screen.blits(batch)
@@ -2,6 +2,12 @@ import pygame
 import sys
 import numpy as np
 import math
+from replay_state import PackedReplayState, PlaybackCursor, LodPyramid
+from data_loader import compute_bounds, merge_bounds, build_global_timeline, estimate_track_length
+from render import TrackLayer, TextCache, TrailBuffer, MarkerSprites
+from geometry import Projection
+from race_order import RaceOrderTimeline
+from profiler import FrameProfiler, NullProfiler
 
 # --- Visual Configuration ---
 BG_COLOR = (13, 13, 17)
@@ -12,6 +18,19 @@ UI_BG = (22, 25, 30)
 UI_BORDER = (55, 60, 70)
 TRAIL_LENGTH = 15 
 
+# Loop rate while paused with nothing to redraw (only input is polled)
+IDLE_FPS = 15
+
+# Dashboard layout: header height, leaderboard panel width and row height, seek bar height
+HEADER_H = 70
+PANEL_W = 240
+ROW_H = 36
+SEEK_BAR_H = 20
+
+# Timing spans of one replay frame, in the order they run
+REPLAY_SPANS = ("stream", "events", "seek", "interpolate", "trails", "leaderboard",
+                "track", "dashboard", "trail_draw", "markers", "overlay", "flip")
+
 def scale_point(x, y, bounds, screen_size):
     min_x, max_x, min_y, max_y = bounds
     width, height = screen_size
@@ -31,20 +50,22 @@ def scale_point(x, y, bounds, screen_size):
     sy = int((y - min_y) / range_y * avail_h) + padding_y
     return sx, height - sy
 
-def build_track_points(drivers_data, bounds, screen_size):
+def build_track_points(drivers_data, bounds, screen_size, projection=None):
+    """
+    Screen-space (N, 2) outline traced by the driver with the most samples.
+    """
     if not drivers_data:
-        return []
+        return np.zeros((0, 2), dtype=np.int64)
     # Safely find best driver
     try:
-        best_driver = max(drivers_data.items(), key=lambda x: len(x[1]))[1]
+        best_driver = max(drivers_data.items(), key=lambda x: len(x[1]["X"]))[1]
     except ValueError:
-        return []
+        return np.zeros((0, 2), dtype=np.int64)
 
-    points = []
-    for _, row in best_driver.iterrows():
-        sx, sy = scale_point(row["X"], row["Y"], bounds, screen_size)
-        points.append((sx, sy))
-    return points
+    if projection is None:
+        projection = Projection(bounds, screen_size)
+    sx, sy = projection.apply(best_driver["X"], best_driver["Y"])
+    return np.column_stack((sx, sy))
 
 def get_interpolated_state(df, t):
     """
@@ -81,131 +102,411 @@ def get_interpolated_state(df, t):
     
     return x, y, dist, lap
 
-def draw_dashboard(screen, font, t, speed, driver_info, leaderboard_order, gaps, current_lap, total_laps, total_time):
-    screen_w, screen_h = screen.get_size()
-    
-    # --- Top Header ---
-    header_h = 70
-    pygame.draw.rect(screen, UI_BG, (0, 0, screen_w, header_h))
-    pygame.draw.line(screen, UI_BORDER, (0, header_h), (screen_w, header_h), 2)
-    
-    # Time
+def load_fonts():
+    """
+    Every font the replay uses, created once per session (SysFont lookups are slow).
+    """
+    return {
+        "large": pygame.font.SysFont("Consolas", 28, bold=True),
+        "header": pygame.font.SysFont("Consolas", 14, bold=True),
+        "name": pygame.font.SysFont("Consolas", 18, bold=True),
+        "gap": pygame.font.SysFont("Consolas", 16),
+        "tag": pygame.font.SysFont("Arial", 10, bold=True),
+    }
+
+def header_text(t, current_lap, total_laps):
+    """
+    Returns the (clock, lap) strings shown in the header.
+    """
     minutes = int(t // 60)
     seconds = int(t % 60)
     millis = int((t % 1) * 100)
     time_str = f"TIME: {minutes:02}:{seconds:02}.{millis:02}"
     lap_str = f"LAP {int(current_lap)} / {total_laps}"
+    return time_str, lap_str
+
+def gap_text(pos, gap_val):
+    """
+    Leaderboard gap label: INT for the leader, -- when the leader's distance is never reached.
+    """
+    if pos == 0:
+        return "INT"
+    if not math.isfinite(gap_val):
+        return "--"
+    return f"+{gap_val:.1f}s"
+
+def seek_progress(screen_w, t, total_time):
+    progress = t / total_time if total_time > 0 else 0
+    return int(screen_w * progress)
+
+def draw_header(screen, fonts, time_str, lap_str, speed, text_cache):
+    screen_w, _ = screen.get_size()
+    text = text_cache.render
+    pygame.draw.rect(screen, UI_BG, (0, 0, screen_w, HEADER_H))
+    pygame.draw.line(screen, UI_BORDER, (0, HEADER_H), (screen_w, HEADER_H), 2)
     
-    font_large = pygame.font.SysFont("Consolas", 28, bold=True)
+    font_large = fonts["large"]
     
-    # Stats
+    # Stats (the clock changes every frame, so it bypasses the cache)
     time_surf = font_large.render(time_str, True, (200, 200, 200))
     screen.blit(time_surf, (20, 20))
     
-    lap_surf = font_large.render(lap_str, True, (255, 255, 255))
+    lap_surf = text(font_large, lap_str, (255, 255, 255))
     screen.blit(lap_surf, (screen_w // 2 - lap_surf.get_width() // 2, 20))
     
-    speed_surf = font_large.render(f"SPEED: {speed}x", True, (100, 200, 255))
+    speed_surf = text(font_large, f"SPEED: {speed}x", (100, 200, 255))
     screen.blit(speed_surf, (screen_w - speed_surf.get_width() - 20, 20))
+    return pygame.Rect(0, 0, screen_w, HEADER_H + 2)
 
-    # --- Side Leaderboard ---
-    panel_w = 240
-    panel_x = screen_w - panel_w
-    panel_y = header_h
-    panel_h = screen_h - header_h - 20 
+def draw_panel_heading(screen, fonts, text_cache):
+    screen_w, _ = screen.get_size()
+    text = text_cache.render
+    panel_x = screen_w - PANEL_W
+    header_font = fonts["header"]
+    pygame.draw.rect(screen, (30, 35, 45), (panel_x, HEADER_H, PANEL_W, 35))
     
-    pygame.draw.rect(screen, UI_BG, (panel_x, panel_y, panel_w, panel_h))
-    pygame.draw.line(screen, UI_BORDER, (panel_x, panel_y), (panel_x, screen_h - 20), 2)
+    screen.blit(text(header_font, "POS", (120, 120, 120)), (panel_x + 10, HEADER_H + 10))
+    screen.blit(text(header_font, "DRIVER", (120, 120, 120)), (panel_x + 50, HEADER_H + 10))
+    screen.blit(text(header_font, "GAP", (120, 120, 120)), (panel_x + 160, HEADER_H + 10))
+    return pygame.Rect(panel_x, HEADER_H, PANEL_W, 35)
+
+def draw_leaderboard_row(screen, fonts, pos, info, gap_str, text_cache):
+    """
+    Draws one leaderboard row; returns its rect, or None when it falls off the panel.
+    """
+    screen_w, screen_h = screen.get_size()
+    text = text_cache.render
+    panel_x = screen_w - PANEL_W
+    y_pos = HEADER_H + 40 + (pos * ROW_H)
     
-    header_font = pygame.font.SysFont("Consolas", 14, bold=True)
-    pygame.draw.rect(screen, (30, 35, 45), (panel_x, panel_y, panel_w, 35))
+    if y_pos + ROW_H > screen_h - SEEK_BAR_H: return None
     
-    screen.blit(header_font.render("POS", True, (120, 120, 120)), (panel_x + 10, panel_y + 10))
-    screen.blit(header_font.render("DRIVER", True, (120, 120, 120)), (panel_x + 50, panel_y + 10))
-    screen.blit(header_font.render("GAP", True, (120, 120, 120)), (panel_x + 160, panel_y + 10))
+    bg_col = (25, 30, 40) if pos % 2 == 0 else (22, 25, 30)
+    if pos == 0: bg_col = (35, 40, 50)
     
-    list_start_y = panel_y + 40
-    row_h = 36
-    name_font = pygame.font.SysFont("Consolas", 18, bold=True)
-    gap_font = pygame.font.SysFont("Consolas", 16)
+    pygame.draw.rect(screen, bg_col, (panel_x, y_pos, PANEL_W, ROW_H))
     
-    for pos, drv_id in enumerate(leaderboard_order):
-        info = driver_info[drv_id]
-        y_pos = list_start_y + (pos * row_h)
-        
-        if y_pos + row_h > screen_h - 20: break
-        
-        bg_col = (25, 30, 40) if pos % 2 == 0 else (22, 25, 30)
-        if pos == 0: bg_col = (35, 40, 50)
-        
-        pygame.draw.rect(screen, bg_col, (panel_x, y_pos, panel_w, row_h))
-        
-        try:
-            c_hex = info['TeamColor'].lstrip('#')
-            c_rgb = tuple(int(c_hex[i:i+2], 16) for i in (0, 2, 4))
-        except: c_rgb = (255, 255, 255)
-        
-        pygame.draw.rect(screen, c_rgb, (panel_x + 4, y_pos + 4, 4, row_h - 8), border_radius=2)
-        
-        pos_surf = name_font.render(str(pos + 1), True, (255, 255, 255) if pos < 3 else (150, 150, 150))
-        screen.blit(pos_surf, (panel_x + 15, y_pos + 8))
-        
-        name_surf = name_font.render(info['Abbreviation'], True, TEXT_COLOR)
-        screen.blit(name_surf, (panel_x + 50, y_pos + 8))
+    try:
+        c_hex = info['TeamColor'].lstrip('#')
+        c_rgb = tuple(int(c_hex[i:i+2], 16) for i in (0, 2, 4))
+    except: c_rgb = (255, 255, 255)
+    
+    pygame.draw.rect(screen, c_rgb, (panel_x + 4, y_pos + 4, 4, ROW_H - 8), border_radius=2)
+    
+    name_font = fonts["name"]
+    pos_surf = text(name_font, str(pos + 1), (255, 255, 255) if pos < 3 else (150, 150, 150))
+    screen.blit(pos_surf, (panel_x + 15, y_pos + 8))
+    
+    name_surf = text(name_font, info['Abbreviation'], TEXT_COLOR)
+    screen.blit(name_surf, (panel_x + 50, y_pos + 8))
+    
+    gap_font = fonts["gap"]
+    if gap_str == "INT":
+        gap_surf = text(gap_font, "INT", (100, 255, 100))
+    elif gap_str == "--":
+        gap_surf = text(gap_font, "--", (200, 100, 100))
+    else:
+        gap_surf = gap_font.render(gap_str, True, (200, 100, 100))
         
-        gap_val = gaps.get(drv_id, 0)
-        if pos == 0:
-            gap_str = "INT"
-            col = (100, 255, 100)
-        else:
-            gap_str = f"+{gap_val:.1f}s"
-            col = (200, 100, 100)
-            
-        gap_surf = gap_font.render(gap_str, True, col)
-        screen.blit(gap_surf, (panel_x + 160, y_pos + 10))
+    screen.blit(gap_surf, (panel_x + 160, y_pos + 10))
+    return pygame.Rect(panel_x, y_pos, PANEL_W, ROW_H)
 
-    # --- Seek Bar ---
-    bar_h = 20
-    bar_y = screen_h - bar_h
-    pygame.draw.rect(screen, (10, 10, 10), (0, bar_y, screen_w, bar_h))
-    progress = t / total_time if total_time > 0 else 0
-    progress_w = int(screen_w * progress)
-    pygame.draw.rect(screen, (200, 50, 50), (0, bar_y, progress_w, bar_h))
+def draw_seek_bar(screen, progress_w):
+    screen_w, screen_h = screen.get_size()
+    bar_y = screen_h - SEEK_BAR_H
+    pygame.draw.rect(screen, (10, 10, 10), (0, bar_y, screen_w, SEEK_BAR_H))
+    pygame.draw.rect(screen, (200, 50, 50), (0, bar_y, progress_w, SEEK_BAR_H))
     pygame.draw.line(screen, (255, 255, 255), (progress_w, bar_y), (progress_w, screen_h), 2)
+    return pygame.Rect(0, bar_y, screen_w, SEEK_BAR_H)
 
-def run_replay(drivers_data, bounds, timeline, metadata):
-    # FIX 6: Guard empty timeline
-    if not drivers_data or not timeline:
-        print("❌ Replay Error: No driver data or timeline available.")
-        return
+def draw_dashboard(screen, fonts, t, speed, driver_info, leaderboard_order, gaps, current_lap, total_laps, total_time, text_cache):
+    screen_w, screen_h = screen.get_size()
+    
+    # --- Top Header ---
+    time_str, lap_str = header_text(t, current_lap, total_laps)
+    draw_header(screen, fonts, time_str, lap_str, speed, text_cache)
 
-    driver_info = metadata["driver_info"]
-    total_laps = metadata.get("total_laps", 0) 
+    # --- Side Leaderboard ---
+    panel_x = screen_w - PANEL_W
+    panel_h = screen_h - HEADER_H - SEEK_BAR_H 
     
-    # --- DATA PREP (Calculate CumDist BEFORE using it) ---
-    for drv_id, df in drivers_data.items():
-        if df.empty: continue
-        coords = df[["X", "Y"]].values
-        diffs = coords[1:] - coords[:-1]
-        dists = np.sqrt((diffs**2).sum(axis=1))
-        dists = np.insert(dists, 0, 0)
-        df["CumDist"] = np.cumsum(dists)
-
-    # FIX 1: Estimate Track Length dynamically for Lap Calculation
-    # Find the maximum distance covered by any driver (usually the winner)
-    max_total_dist = 0
-    for df in drivers_data.values():
-        if not df.empty and "CumDist" in df.columns:
-            d = df["CumDist"].iloc[-1]
-            if d > max_total_dist:
-                max_total_dist = d
+    pygame.draw.rect(screen, UI_BG, (panel_x, HEADER_H, PANEL_W, panel_h))
+    pygame.draw.line(screen, UI_BORDER, (panel_x, HEADER_H), (panel_x, screen_h - SEEK_BAR_H), 2)
+    draw_panel_heading(screen, fonts, text_cache)
     
-    # If total_laps is valid AND distance is valid, calculate approx track length. 
-    # Otherwise default to 5000m. Prevents 0 division.
-    if total_laps > 0 and max_total_dist > 0:
-        track_length_approx = max_total_dist / total_laps
+    for pos, drv_id in enumerate(leaderboard_order):
+        gap_str = gap_text(pos, gaps.get(drv_id, 0))
+        if draw_leaderboard_row(screen, fonts, pos, driver_info[drv_id], gap_str, text_cache) is None: break
+
+    # --- Seek Bar ---
+    draw_seek_bar(screen, seek_progress(screen_w, t, total_time))
+
+def pack_race(race_data):
+    """
+    Swaps race_data["drivers"] for a PackedReplayState, releasing the per-driver frames.
+    For replays no streaming loader adds drivers to, so telemetry is held only once.
+    """
+    if not isinstance(race_data["drivers"], PackedReplayState):
+        race_data["drivers"] = PackedReplayState.from_frames(race_data["drivers"])
+    return race_data
+
+def prepare_state(drivers_data, total_laps, track_length=None):
+    """
+    Returns (PackedReplayState, track_length_approx) for the replay loop.
+    load_race already provides CumDist and the track length, so this only packs.
+    """
+    # A PackedReplayState (e.g. a memory-mapped store) is replayed as-is;
+    # frames are packed once so each frame is a single batched lookup
+    if isinstance(drivers_data, PackedReplayState):
+        state = drivers_data
     else:
-        track_length_approx = 5000 
+        state = PackedReplayState.from_frames(drivers_data)
+
+    # Streaming loads only know the track length once every driver is in
+    if track_length is None:
+        track_length = estimate_track_length(state.cum_dist[state.ends], total_laps)
+
+    return state, track_length
+
+def team_rgb(info):
+    try:
+        h = info['TeamColor'].lstrip('#')
+        return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+    except Exception: return (200, 200, 200)
+
+class ReplayScene:
+    """
+    Everything needed to draw the race at an arbitrary time: packed telemetry,
+    playback cursor, projection, cached layers and per-driver trails.
+    Shared by the interactive window (run_replay) and the headless exporter.
+    """
+
+    def __init__(self, drivers_data, bounds, timeline, metadata, screen_size, trail_length=TRAIL_LENGTH):
+        # Frames are kept (next to their packed copy) only so add_drivers can repack;
+        # callers that never stream pass a PackedReplayState instead (see pack_race)
+        self.drivers_data = drivers_data
+        self.bounds = bounds
+        # Percentile clipping applied to the bounds of streamed-in drivers (None = exact)
+        self.bounds_clip = None
+        self.screen_size = screen_size
+        self.driver_info = metadata["driver_info"]
+        self.total_laps = metadata.get("total_laps", 0)
+        self.track_length = metadata.get("track_length")
+
+        self.fonts = load_fonts()
+        self.text_cache = TextCache()
+        self.markers = MarkerSprites(self.fonts["tag"])
+        self.track_layer = TrackLayer(BG_COLOR, TRACK_OUTLINE, TRACK_COLOR)
+        self.drv_colors = {drv: team_rgb(info) for drv, info in self.driver_info.items()}
+        # run_replay swaps in a FrameProfiler; spans are marked as each phase finishes
+        self.profiler = NullProfiler()
+
+        self._rebuild(timeline)
+        self.level = 0
+        # Forward playback steps the cursor; jumps re-locate it with a binary search
+        self.cursor = PlaybackCursor(self.state, self.start)
+        self.trail_length = trail_length
+        self.trails = TrailBuffer(len(self.state), trail_length)
+        # What the last draw left on screen, for draw_dirty (None forces a full redraw)
+        self._drawn = None
+        self._car_rects = []
+
+    def _rebuild(self, timeline):
+        self.state, self.track_length_approx = prepare_state(self.drivers_data, self.total_laps, self.track_length)
+        # Decimated copies for fast playback and scrubbing; positions come from the active level
+        self.lod = LodPyramid(self.state)
+        self.start = timeline[0]
+        self.end = timeline[-1]
+        # Order and time gaps are filled a window at a time as playback reaches them, so
+        # building this (again on each streamed driver) reads no telemetry up front
+        self.race_order = RaceOrderTimeline(self.state, self.start, self.end)
+        self.projection = Projection(self.bounds, self.screen_size)
+        track_points = build_track_points(self.state.driver_views(), self.bounds, self.screen_size, self.projection)
+        self.track_layer.set_points(track_points)
+
+    def add_drivers(self, arrived, t):
+        """
+        Folds in (driver, info, telemetry) tuples from a streaming loader.
+        """
+        for drv, info, df in arrived:
+            self.drivers_data[drv] = df
+            self.driver_info[drv] = info
+            self.drv_colors[drv] = team_rgb(info)
+        self.bounds = merge_bounds(self.bounds, compute_bounds({drv: df for drv, _, df in arrived}, self.bounds_clip))
+        old_ids = self.state.driver_ids
+        self._rebuild(build_global_timeline(self.drivers_data))
+        self.trails.reindex(old_ids, self.state.driver_ids)
+        self._drawn = None
+        self.cursor = PlaybackCursor(self.lod.level(self.level), t)
+
+    def seek(self, t):
+        self.cursor.seek(t)
+
+    def set_level(self, level, t):
+        """
+        Switches the level of detail positions are read from (0 = full resolution).
+        """
+        if level != self.level:
+            self.level = level
+            self.cursor = PlaybackCursor(self.lod.level(level), t)
+
+    def clear_trails(self):
+        self.trails.clear()
+
+    def update(self, t):
+        """
+        Advances every driver to time t and extends the trails.
+        Returns (frame data in race order, leader lap, leader distance).
+        """
+        mark = self.profiler.mark
+        xs, ys, _, _ = self.cursor.interpolate(t)
+        screen_xs, screen_ys = self.projection.apply(xs, ys)
+        mark("interpolate")
+        
+        self.trails.push(screen_xs, screen_ys)
+        mark("trails")
+
+        order, gaps, leader_lap, leader_dist = self.race_order.at(t)
+        current_frame_data = [
+            {
+                "id": self.state.driver_ids[k],
+                "gap": gaps[k],
+                "sx": int(screen_xs[k]),
+                "sy": int(screen_ys[k])
+            }
+            for k in order
+        ]
+        mark("leaderboard")
+        return current_frame_data, leader_lap, leader_dist
+
+    def draw(self, screen, t, speed):
+        """
+        Renders the full frame for time t onto screen.
+        """
+        mark = self.profiler.mark
+        current_frame_data, current_lap, leader_dist = self.update(t)
+
+        # Background and static track come from one cached surface
+        self.track_layer.draw(screen)
+        mark("track")
+        self._drawn = None
+        self._car_rects = []
+
+        # FIX 7: Guard empty frame (prevent crash if no drivers at timestamp)
+        if not current_frame_data:
+            return
+
+        leaderboard_order = [d["id"] for d in current_frame_data]
+        gaps = {d["id"]: d["gap"] for d in current_frame_data}
+        current_lap = self._display_lap(current_lap, leader_dist)
+
+        draw_dashboard(screen, self.fonts, t, speed, self.driver_info, leaderboard_order, gaps, current_lap, self.total_laps, self.end, self.text_cache)
+        self._drawn = self._dashboard_state(screen, t, speed, current_frame_data, current_lap)
+        mark("dashboard")
+
+        self._car_rects = self._draw_cars(screen, current_frame_data)
+
+    def draw_dirty(self, screen, t, speed):
+        """
+        Brings a screen last painted by draw()/draw_dirty() up to time t, repainting
+        only what changed: the cars and trails (erased from the cached track layer
+        and redrawn), header text, leaderboard rows whose content moved, and the
+        seek bar. Returns the changed rects for pygame.display.update.
+        """
+        if self._drawn is None or self._drawn["size"] != screen.get_size():
+            self.draw(screen, t, speed)
+            return [screen.get_rect()]
+
+        mark = self.profiler.mark
+        current_frame_data, current_lap, leader_dist = self.update(t)
+        if not current_frame_data:
+            self.draw(screen, t, speed)
+            return [screen.get_rect()]
+
+        dirty = list(self._car_rects)
+        self.track_layer.restore(screen, self._car_rects)
+        mark("track")
+
+        current_lap = self._display_lap(current_lap, leader_dist)
+        state = self._dashboard_state(screen, t, speed, current_frame_data, current_lap)
+        drawn = self._drawn
+        if state["header"] != drawn["header"]:
+            time_str, lap_str, _ = state["header"]
+            dirty.append(draw_header(screen, self.fonts, time_str, lap_str, speed, self.text_cache))
+            # The header's bottom border runs under the panel heading; put the heading back on top
+            dirty.append(draw_panel_heading(screen, self.fonts, self.text_cache))
+        for pos, row in enumerate(state["rows"]):
+            if pos < len(drawn["rows"]) and drawn["rows"][pos] == row:
+                continue
+            rect = draw_leaderboard_row(screen, self.fonts, pos, self.driver_info[row[0]], row[1], self.text_cache)
+            if rect is None: break
+            dirty.append(rect)
+        if state["seek"] != drawn["seek"]:
+            dirty.append(draw_seek_bar(screen, state["seek"]))
+        self._drawn = state
+        mark("dashboard")
+
+        self._car_rects = self._draw_cars(screen, current_frame_data)
+        dirty.extend(self._car_rects)
+        return dirty
+
+    def _display_lap(self, current_lap, leader_dist):
+        # Fallback for lap calc if not in data (using estimated track length)
+        if current_lap == 0:
+            current_lap = int(leader_dist / self.track_length_approx) + 1
+        return current_lap
+
+    def _dashboard_state(self, screen, t, speed, current_frame_data, current_lap):
+        # Everything the dashboard's text and bars depend on, compared frame to frame
+        time_str, lap_str = header_text(t, current_lap, self.total_laps)
+        return {
+            "size": screen.get_size(),
+            "header": (time_str, lap_str, speed),
+            "rows": [(d["id"], gap_text(pos, d["gap"])) for pos, d in enumerate(current_frame_data)],
+            "seek": seek_progress(screen.get_width(), t, self.end),
+        }
+
+    def _draw_cars(self, screen, current_frame_data):
+        """
+        Trails and markers, clipped to the track area so they never paint over the
+        dashboard. Returns the rects they cover.
+        """
+        mark = self.profiler.mark
+        screen_w, screen_h = screen.get_size()
+        previous_clip = screen.get_clip()
+        screen.set_clip(pygame.Rect(0, HEADER_H + 2, screen_w - PANEL_W, screen_h - SEEK_BAR_H - HEADER_H - 2))
+
+        leaderboard_order = [d["id"] for d in current_frame_data]
+        rects = self.trails.draw(
+            screen,
+            [self.state.index[drv_code] for drv_code in leaderboard_order],
+            [self.drv_colors[drv_code] for drv_code in leaderboard_order]
+        )
+        mark("trail_draw")
+
+        rects += self.markers.draw(screen, (
+            (self.drv_colors[d["id"]], self.driver_info[d["id"]]['Abbreviation'], d["sx"], d["sy"])
+            for d in current_frame_data
+        ))
+        mark("markers")
+
+        screen.set_clip(previous_clip)
+        return [rect for rect in rects if rect.width and rect.height]
+
+def run_replay(drivers_data, bounds, timeline, metadata, live=None, profile_csv=None, bounds_clip=None,
+               trail_length=TRAIL_LENGTH):
+    """
+    Interactive replay window. With `live` (a StreamingRaceLoader), drivers that
+    finish loading after the window opens are folded in as they arrive, with
+    their bounds clipped by bounds_clip percent when given.
+    P toggles the frame-timing overlay; profile_csv also logs every frame's timings.
+    Frames are composited with dirty rectangles (see ReplayScene.draw_dirty), and
+    nothing is rendered while paused until there is input.
+    """
+    # FIX 6: Guard empty timeline
+    if not drivers_data or not timeline:
+        print("❌ Replay Error: No driver data or timeline available.")
+        return
 
     pygame.init()
     screen_size = (1280, 850) 
@@ -213,129 +514,117 @@ def run_replay(drivers_data, bounds, timeline, metadata):
     pygame.display.set_caption(f"F1 Telemetry Pro | {metadata.get('race_name', 'Race')}")
     clock = pygame.time.Clock()
     
-    font = pygame.font.SysFont("Consolas", 24, bold=True)
-    tag_font = pygame.font.SysFont("Arial", 10, bold=True)
-    
-    track_points = build_track_points(drivers_data, bounds, screen_size)
-    
-    time_val = timeline[0]
-    total_time = timeline[-1]
+    scene = ReplayScene(drivers_data, bounds, timeline, metadata, screen_size, trail_length)
+    profiler = FrameProfiler(spans=REPLAY_SPANS, csv_path=profile_csv)
+    scene.profiler = profiler
+    scene.bounds_clip = bounds_clip
+    time_val = scene.start
     
     running = True
     paused = False
+    scrubbing = False
     speed = 1.0
-    
-    drv_colors = {}
-    for drv, info in driver_info.items():
-        try:
-            h = info['TeamColor'].lstrip('#')
-            drv_colors[drv] = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-        except: drv_colors[drv] = (200, 200, 200)
-        
-    trails = {drv: [] for drv in drivers_data}
+    # The whole window is repainted on the first frame, after exposure and while
+    # the profiler overlay is (or was just) on screen; otherwise only dirty rects
+    full_redraw = True
             
     while running:
-        screen.fill(BG_COLOR)
+        profiler.begin_frame()
         dt = clock.get_time() / 1000.0 
         screen_w, screen_h = screen.get_size()
+        seeking = False
+        had_input = False
+        
+        # --- STREAMING: fold in drivers that finished loading since the last frame ---
+        arrived = live.drain() if live is not None else []
+        if arrived:
+            scene.add_drivers(arrived, time_val)
+        profiler.mark("stream")
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT: running = False
+            if event.type == pygame.VIDEOEXPOSE: full_redraw = True
             
             if event.type == pygame.KEYDOWN:
+                had_input = True
                 if event.key == pygame.K_SPACE: paused = not paused
+                if event.key == pygame.K_p:
+                    profiler.visible = not profiler.visible
+                    full_redraw = True
                 if event.key == pygame.K_1: speed = 0.5
                 if event.key == pygame.K_2: speed = 1.0
                 if event.key == pygame.K_3: speed = 2.0
                 if event.key == pygame.K_4: speed = 4.0
                 if event.key == pygame.K_UP: speed = min(speed + 0.5, 10.0)
                 if event.key == pygame.K_DOWN: speed = max(speed - 0.5, 0.0)
-                if event.key == pygame.K_RIGHT: time_val += 5.0
-                if event.key == pygame.K_LEFT: time_val -= 5.0
+                if event.key == pygame.K_RIGHT:
+                    time_val += 5.0
+                    seeking = True
+                if event.key == pygame.K_LEFT:
+                    time_val -= 5.0
+                    seeking = True
                 if event.key == pygame.K_r: 
-                    time_val = timeline[0]
-                    trails = {drv: [] for drv in drivers_data} 
+                    time_val = scene.start
+                    seeking = True
+                    scene.clear_trails()
             
             if event.type == pygame.MOUSEBUTTONDOWN:
+                had_input = True
                 if event.button == 1:
                     mx, my = pygame.mouse.get_pos()
                     if my > screen_h - 20:
                         ratio = mx / screen_w
-                        time_val = ratio * total_time
-                        trails = {drv: [] for drv in drivers_data}
-
-        if len(track_points) > 1:
-            pygame.draw.lines(screen, TRACK_OUTLINE, False, track_points, 16)
-            pygame.draw.lines(screen, TRACK_COLOR, False, track_points, 6)
+                        time_val = ratio * scene.end
+                        seeking = True
+                        scrubbing = True
+                        scene.clear_trails()
+            
+            # Dragging along the seek bar scrubs through the coarsest level of detail
+            if event.type == pygame.MOUSEMOTION and scrubbing:
+                had_input = True
+                ratio = min(max(event.pos[0] / screen_w, 0.0), 1.0)
+                time_val = ratio * scene.end
+                seeking = True
+                scene.clear_trails()
             
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                had_input = True
+                scrubbing = False
+        profiler.mark("events")
+
+        # Paused and nothing happened: the screen is already correct, so skip the frame
+        if paused and not (had_input or arrived or full_redraw) and running:
+            profiler.skip_frame()
+            clock.tick(IDLE_FPS)
+            continue
+
         if not paused:
             time_val += dt * speed
-            if time_val > total_time: time_val = timeline[0]
+            if time_val > scene.end:
+                time_val = scene.start
+                seeking = True
         
-        time_val = max(timeline[0], min(time_val, total_time))
+        time_val = max(scene.start, min(time_val, scene.end))
+        scene.set_level(scene.lod.level_for(speed, scrubbing), time_val)
+        if seeking:
+            scene.seek(time_val)
+        profiler.mark("seek")
         
-        # --- UPDATE DRIVERS ---
-        current_frame_data = [] 
-        
-        for drv_code, df in drivers_data.items():
-            if df.empty: continue
-            rx, ry, dist, lap = get_interpolated_state(df, time_val)
-            sx, sy = scale_point(rx, ry, bounds, screen_size)
-            
-            trails[drv_code].append((sx, sy))
-            if len(trails[drv_code]) > TRAIL_LENGTH:
-                trails[drv_code].pop(0)
-            
-            current_frame_data.append({
-                "id": drv_code,
-                "dist": dist,
-                "lap": lap,
-                "sx": sx, 
-                "sy": sy
-            })
-
-        # FIX 7: Guard empty frame (prevent crash if no drivers at timestamp)
-        if current_frame_data:
-            # Sort by Distance
-            current_frame_data.sort(key=lambda x: x["dist"], reverse=True)
-            leaderboard_order = [d["id"] for d in current_frame_data]
-            
-            # Calculate Gaps
-            leader_dist = current_frame_data[0]["dist"]
-            current_lap = current_frame_data[0]["lap"]
-            
-            # Fallback for lap calc if not in data (using estimated track length)
-            if current_lap == 0:
-                current_lap = int(leader_dist / track_length_approx) + 1
-
-            gaps = {}
-            for d in current_frame_data:
-                delta_m = leader_dist - d["dist"]
-                gaps[d["id"]] = delta_m / 70.0 
-
-            draw_dashboard(screen, font, time_val, speed, driver_info, leaderboard_order, gaps, current_lap, total_laps, total_time)
-
-            for drv_code in leaderboard_order:
-                pts = trails[drv_code]
-                if len(pts) > 1:
-                    c = drv_colors[drv_code]
-                    for i in range(len(pts) - 1):
-                        th = max(1, int(4 * (i/len(pts))))
-                        pygame.draw.line(screen, c, pts[i], pts[i+1], th)
-
-            for d in current_frame_data:
-                c = drv_colors[d["id"]]
-                sx, sy = d["sx"], d["sy"]
-                
-                pygame.draw.circle(screen, (0, 0, 0), (sx, sy), 9)
-                pygame.draw.circle(screen, c, (sx, sy), 7)
-                pygame.draw.circle(screen, (255, 255, 255), (sx, sy), 2)
-                
-                lbl = tag_font.render(driver_info[d["id"]]['Abbreviation'], True, (220, 220, 220))
-                screen.blit(lbl, (sx + 12, sy - 12))
-            
-        pygame.display.flip()
+        if full_redraw or profiler.visible:
+            scene.draw(screen, time_val, speed)
+            profiler.draw(screen, scene.fonts["gap"])
+            profiler.mark("overlay")
+            pygame.display.flip()
+            # Leaving the overlay on screen needs one more full repaint to clear it
+            full_redraw = profiler.visible
+        else:
+            dirty = scene.draw_dirty(screen, time_val, speed)
+            profiler.mark("overlay")
+            pygame.display.update(dirty)
+        profiler.mark("flip")
+        profiler.end_frame()
         clock.tick(60) 
         
+    profiler.close()
     pygame.quit()
-    sys.exit()
\ No newline at end of file
+    sys.exit()
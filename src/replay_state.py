@@ -0,0 +1,244 @@
+import numpy as np
+from compact_telemetry import CompactTelemetry, COMPACT_DTYPES
+
+# Columns packed for every driver, in storage order
+STATE_COLUMNS = ("Time", "X", "Y", "CumDist", "LapNumber")
+
+def cumulative_distance(x, y):
+    """
+    Returns the running path length along (x, y), starting at 0.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) == 0:
+        return np.zeros(0)
+    steps = np.hypot(np.diff(x), np.diff(y))
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+class PackedReplayState:
+    """
+    Every driver's Time/X/Y/CumDist/LapNumber (plus any extra columns, e.g. LapDist)
+    packed into contiguous NumPy columns.
+    Driver k occupies rows offsets[k] .. offsets[k] + lengths[k] - 1 of each column.
+    """
+
+    def __init__(self, driver_ids, columns, offsets, lengths):
+        self.driver_ids = list(driver_ids)
+        self.columns = columns
+        self.time = columns["Time"]
+        self.x = columns["X"]
+        self.y = columns["Y"]
+        self.cum_dist = columns["CumDist"]
+        self.lap = columns["LapNumber"]
+        self.lap_dist = columns.get("LapDist")
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        # Absolute index of each driver's last sample
+        self.ends = self.offsets + self.lengths - 1
+        self.index = {drv: k for k, drv in enumerate(self.driver_ids)}
+        # Precomputed decimated copies by factor (e.g. mapped from a store), used by LodPyramid
+        self.levels = {}
+
+    @classmethod
+    def from_frames(cls, drivers_data, extra_columns=()):
+        """
+        Packs a {driver: DataFrame} mapping as returned by load_race.
+        CumDist is derived from X/Y when a frame does not carry it.
+        When every driver is a CompactTelemetry the packed columns keep the compact
+        dtypes (Time is always float64 seconds); otherwise everything is float64.
+        extra_columns are packed after STATE_COLUMNS when every driver carries them.
+        """
+        compact = bool(drivers_data) and all(isinstance(df, CompactTelemetry) for df in drivers_data.values())
+        optional = [
+            col for col in extra_columns
+            if drivers_data and all(col in df for df in drivers_data.values())
+        ]
+        packed = STATE_COLUMNS + tuple(optional)
+        dtypes = {col: COMPACT_DTYPES.get(col, np.float64) if compact else np.float64 for col in packed}
+
+        driver_ids, lengths = [], []
+        chunks = {col: [] for col in packed}
+
+        for drv, df in drivers_data.items():
+            if len(df) == 0: continue
+            x = np.asarray(df["X"], dtype=dtypes["X"])
+            y = np.asarray(df["Y"], dtype=dtypes["Y"])
+            if "CumDist" in df:
+                cum_dist = np.asarray(df["CumDist"], dtype=dtypes["CumDist"])
+            else:
+                cum_dist = cumulative_distance(x, y).astype(dtypes["CumDist"], copy=False)
+
+            chunks["Time"].append(np.asarray(df["Time"], dtype=np.float64))
+            chunks["X"].append(x)
+            chunks["Y"].append(y)
+            chunks["CumDist"].append(cum_dist)
+            chunks["LapNumber"].append(np.asarray(df["LapNumber"], dtype=dtypes["LapNumber"]))
+            for col in optional:
+                chunks[col].append(np.asarray(df[col], dtype=dtypes[col]))
+            driver_ids.append(drv)
+            lengths.append(len(df))
+
+        columns = {
+            col: np.concatenate(parts) if parts else np.zeros(0, dtype=dtypes[col])
+            for col, parts in chunks.items()
+        }
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if lengths else []
+        return cls(driver_ids, columns, offsets, lengths)
+
+    def __len__(self):
+        return len(self.driver_ids)
+
+    def driver_slice(self, drv):
+        k = self.index[drv]
+        start = int(self.offsets[k])
+        return slice(start, start + int(self.lengths[k]))
+
+    def driver_views(self):
+        """
+        Returns {driver: {column: array}} slices into the packed columns (no copies).
+        """
+        views = {}
+        for drv in self.driver_ids:
+            rows = self.driver_slice(drv)
+            views[drv] = {col: arr[rows] for col, arr in self.columns.items()}
+        return views
+
+    def locate(self, t):
+        """
+        Binary search: per driver, the absolute index of the first sample with Time >= t.
+        """
+        idx = np.empty(len(self.driver_ids), dtype=np.int64)
+        for k in range(len(idx)):
+            start = self.offsets[k]
+            times = self.time[start:start + self.lengths[k]]
+            idx[k] = start + np.searchsorted(times, t)
+        return idx
+
+    def interpolate(self, t, idx=None):
+        """
+        Returns (x, y, dist, lap) arrays holding every driver's state at time t.
+        idx is the result of locate(t); it is computed when not supplied.
+        """
+        if idx is None:
+            idx = self.locate(t)
+
+        # Bracket t between samples lo and hi, clamped to the driver's own rows
+        hi = np.minimum(np.maximum(idx, self.offsets + 1), self.ends)
+        lo = np.maximum(hi - 1, self.offsets)
+
+        t0 = self.time[lo]
+        t1 = self.time[hi]
+        span = t1 - t0
+        safe_span = np.where(span > 0, span, 1.0)
+        alpha = np.clip(np.where(span > 0, (t - t0) / safe_span, 0.0), 0.0, 1.0)
+
+        x0, y0, d0 = self.x[lo], self.y[lo], self.cum_dist[lo]
+        x = x0 + (self.x[hi] - x0) * alpha
+        y = y0 + (self.y[hi] - y0) * alpha
+        dist = d0 + (self.cum_dist[hi] - d0) * alpha
+
+        # Lap is the most recent sample's value; past the end we hold the last one
+        lap = np.where(idx > self.ends, self.lap[hi], self.lap[lo])
+
+        return x, y, dist, lap
+
+class PlaybackCursor:
+    """
+    Stateful per-driver position in a PackedReplayState for forward playback.
+    advance() walks each driver forward a few samples (amortized O(1) per frame);
+    seek() re-locates every driver with a binary search.
+    """
+    # Forward steps tried before a large jump is treated as a seek
+    MAX_STEPS = 8
+
+    def __init__(self, state, t):
+        self.state = state
+        self.seek(t)
+
+    def seek(self, t):
+        self.idx = self.state.locate(t)
+        self.t = t
+        return self.idx
+
+    def advance(self, t):
+        """
+        Moves the cursor to time t. Going backwards falls back to a seek.
+        """
+        if t < self.t:
+            return self.seek(t)
+
+        state = self.state
+        idx = self.idx
+        for _ in range(self.MAX_STEPS):
+            # Invariant: idx is the first sample with Time >= t, or end + 1
+            behind = (idx <= state.ends) & (state.time[np.minimum(idx, state.ends)] < t)
+            if not behind.any():
+                self.t = t
+                return idx
+            idx += behind
+
+        return self.seek(t)
+
+    def interpolate(self, t):
+        """
+        Same result as state.interpolate(t), using the cursor instead of a search.
+        """
+        return self.state.interpolate(t, self.advance(t))
+
+# Decimation factors of the level-of-detail pyramid, finest first
+LOD_FACTORS = (1, 4, 16)
+
+# Playback speed from which each coarser level takes over (level 0 is always allowed)
+LOD_SPEED_THRESHOLDS = (6.0, float("inf"))
+
+def decimate_state(state, factor):
+    """
+    Copy of state keeping every factor-th sample of each driver, plus its last one.
+    """
+    if factor <= 1:
+        return state
+
+    rows, lengths = [], []
+    for start, end in zip(state.offsets, state.ends):
+        kept = np.arange(start, end + 1, factor)
+        if kept[-1] != end:
+            kept = np.append(kept, end)
+        rows.append(kept)
+        lengths.append(len(kept))
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    # Only what playback reads; extra stored columns are left out of the coarse levels
+    columns = {col: np.asarray(state.columns[col][rows]) for col in STATE_COLUMNS}
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if lengths else []
+    return PackedReplayState(state.driver_ids, columns, offsets, lengths)
+
+class LodPyramid:
+    """
+    Multi-resolution copies of a PackedReplayState (1x, 4x, 16x decimated by default).
+    Coarse levels come from state.levels when the state carries them (a mapped store
+    does, so decimating never pages in the whole race); otherwise they are built on
+    first use, so a replay that never scrubs or runs fast never pays for them.
+    """
+
+    def __init__(self, state, factors=LOD_FACTORS):
+        self.factors = tuple(factors)
+        self._levels = [state] + [None] * (len(self.factors) - 1)
+
+    def level(self, i):
+        if self._levels[i] is None:
+            base = self._levels[0]
+            stored = base.levels.get(self.factors[i])
+            self._levels[i] = stored if stored is not None else decimate_state(base, self.factors[i])
+        return self._levels[i]
+
+    def level_for(self, speed, scrubbing=False):
+        """
+        Picks the level to play from: the coarsest while scrubbing, otherwise by speed.
+        """
+        if scrubbing:
+            return len(self.factors) - 1
+        level = 0
+        for i, threshold in enumerate(LOD_SPEED_THRESHOLDS[:len(self.factors) - 1], start=1):
+            if speed >= threshold:
+                level = i
+        return level
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Local index of season calendars, so the race menu never waits on FastF1
+SCHEDULE_INDEX_PATH = os.path.join("cache", "schedules.json")
+SCHEDULE_INDEX_VERSION = 1
+
+# Seasons offered by the year menu, newest first
+SEASON_YEARS = list(range(2025, 2017, -1))
+
+# Past seasons are final; only the current (or a future) one is re-fetched, at most daily
+SCHEDULE_MAX_AGE = 24 * 3600
+
+def fetch_schedule(year):
+    """
+    Downloads one season's calendar as menu items: [{"label": name, "sub": "R1 | Location | 02 Mar"}].
+    """
+    import fastf1
+
+    os.makedirs("cache", exist_ok=True)
+    fastf1.Cache.enable_cache("cache")
+    schedule = fastf1.get_event_schedule(year, include_testing=False)
+    if schedule.empty:
+        return []
+
+    # Whole columns at once instead of iterrows()
+    names = schedule["EventName"].fillna("Unknown GP").astype(str).tolist()
+    locations = schedule["Location"].fillna("Unknown").astype(str).tolist()
+    rounds = schedule["RoundNumber"].tolist()
+    dates = schedule["EventDate"]
+    dates = dates.dt.strftime("%d %b").fillna("") if hasattr(dates, "dt") else dates.astype(str)
+
+    return [
+        {"label": name, "sub": f"R{rnd} | {loc} | {date}"}
+        for name, rnd, loc, date in zip(names, rounds, locations, dates.tolist())
+    ]
+
+class ScheduleIndex:
+    """
+    Season calendars kept in a small JSON file and refreshed by one background thread.
+    get() never touches the network; request() moves a year to the front of the queue.
+    """
+
+    def __init__(self, path=SCHEDULE_INDEX_PATH):
+        self.path = path
+        self.errors = {}
+        self._years = {}
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._running = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get("version") == SCHEDULE_INDEX_VERSION:
+            self._years = {int(year): entry for year, entry in index.get("years", {}).items()}
+
+    def _save(self):
+        with self._lock:
+            index = {"version": SCHEDULE_INDEX_VERSION, "years": {str(y): e for y, e in self._years.items()}}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def get(self, year):
+        """
+        Returns the cached menu items for a season, or None if it has not been fetched yet.
+        """
+        with self._lock:
+            entry = self._years.get(year)
+        return None if entry is None else entry["events"]
+
+    def refresh(self, years=SEASON_YEARS):
+        """
+        Queues every stale season for a background fetch.
+        """
+        with self._lock:
+            for year in years:
+                if self._is_stale(year) and year not in self._queue:
+                    self._queue.append(year)
+            if self._queue:
+                self._start_locked()
+
+    def request(self, year):
+        """
+        Fetches a season next, ahead of the rest of the queue (e.g. the one just chosen).
+        """
+        with self._lock:
+            self.errors.pop(year, None)
+            if year in self._queue:
+                self._queue.remove(year)
+            self._queue.appendleft(year)
+            self._start_locked()
+
+    def _is_stale(self, year):
+        entry = self._years.get(year)
+        if entry is None:
+            return True
+        season_over = year < time.localtime().tm_year
+        return not season_over and time.time() - entry["fetched"] > SCHEDULE_MAX_AGE
+
+    def _start_locked(self):
+        # Called with the lock held; the worker clears _running under the same lock
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._running = False
+                    return
+                year = self._queue.popleft()
+            try:
+                events = fetch_schedule(year)
+            except Exception as e:
+                self.errors[year] = str(e)
+                continue
+            with self._lock:
+                self._years[year] = {"fetched": time.time(), "events": events}
+            try:
+                self._save()
+            except OSError as e:
+                print(f"⚠️ Warning: could not write schedule index: {e}")
@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+from timeline import Timeline
+
+# Second-level cache of fully processed load_race output (FastF1 keeps its own raw cache)
+SESSION_CACHE_DIR = os.path.join("cache", "sessions")
+
+# Bump whenever load_race's output changes so stale entries are ignored
+LOADER_VERSION = 2
+
+def session_key(year, race_name):
+    """
+    Filesystem-safe name for a (year, race) pair under the current loader version.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", str(race_name).lower()).strip("_")
+    return f"{year}_{slug}_v{LOADER_VERSION}"
+
+def session_cache_path(year, race_name, cache_dir=SESSION_CACHE_DIR):
+    """
+    Returns the .npz path for a (year, race) pair under the current loader version.
+    """
+    return os.path.join(cache_dir, session_key(year, race_name) + ".npz")
+
+def save_session(race_data, path):
+    """
+    Writes a load_race result as one uncompressed .npz.
+    Driver frames are stored column-wise and concatenated; lengths split them back.
+    Columns are always written as float64, so compact and full loads share entries.
+    The timeline is not stored: it is rebuilt from the frames on load.
+    """
+    drivers = race_data["drivers"]
+    driver_ids = list(drivers)
+    columns = list(next(iter(drivers.values())).columns) if drivers else []
+
+    arrays = {
+        f"col_{col}": np.concatenate([np.asarray(drivers[drv][col], dtype=np.float64) for drv in driver_ids])
+        for col in columns
+    }
+    arrays["lengths"] = np.array([len(drivers[drv]) for drv in driver_ids], dtype=np.int64)
+
+    header = {
+        "loader_version": LOADER_VERSION,
+        "driver_ids": driver_ids,
+        "columns": columns,
+        "bounds": [float(b) for b in race_data["track"]["bounds"]],
+        "robust_bounds": [float(b) for b in race_data["track"].get("robust_bounds", race_data["track"]["bounds"])],
+        "metadata": race_data["metadata"],
+    }
+    arrays["header"] = np.array(json.dumps(header))
+
+    # Write then rename, so an interrupted save never leaves a half-written entry
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def load_session(path):
+    """
+    Reads a cached session in load_race's return shape.
+    Returns None when the entry is missing, unreadable or from another loader version.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            header = json.loads(str(npz["header"]))
+            if header.get("loader_version") != LOADER_VERSION:
+                return None
+
+            columns = {col: npz[f"col_{col}"] for col in header["columns"]}
+            lengths = npz["lengths"]
+    except Exception as e:
+        print(f"⚠️ Warning: ignoring unreadable session cache {path}: {e}")
+        return None
+
+    drivers_data = {}
+    start = 0
+    for drv, length in zip(header["driver_ids"], lengths):
+        end = start + int(length)
+        drivers_data[drv] = pd.DataFrame({col: arr[start:end] for col, arr in columns.items()})
+        start = end
+
+    return {
+        "drivers": drivers_data,
+        "track": {
+            "bounds": tuple(header["bounds"]),
+            "robust_bounds": tuple(header.get("robust_bounds", header["bounds"])),
+            "timeline": Timeline.from_frames(drivers_data)
+        },
+        "metadata": header["metadata"]
+    }
@@ -0,0 +1,139 @@
+import json
+import os
+import numpy as np
+from replay_state import PackedReplayState, STATE_COLUMNS, LOD_FACTORS, decimate_state
+from session_cache import LOADER_VERSION, session_key
+from timeline import Timeline
+
+# Memory-mappable telemetry stores, one <key>.bin + <key>.json pair per session
+STORE_DIR = os.path.join("cache", "stores")
+
+# Every column is written as little-endian float64, one column after another
+STORE_DTYPE = "<f8"
+
+# Stored after the replay's STATE_COLUMNS; mapped with them but never read by playback
+STORE_EXTRA_COLUMNS = ("LapDist",)
+
+# Bump when the store layout changes (2: LapDist column, 3: LOD levels); older stores are rewritten
+STORE_VERSION = 3
+
+def store_path(year, race_name, store_dir=STORE_DIR):
+    """
+    Returns the store base path (without extension) for a (year, race) pair.
+    """
+    return os.path.join(store_dir, session_key(year, race_name))
+
+def write_store(race_data, path):
+    """
+    Writes a load_race result as a fixed-layout float array plus a JSON index.
+    The .bin file holds STATE_COLUMNS and then STORE_EXTRA_COLUMNS back to back, each
+    spanning every driver's rows, followed by the coarse LOD levels (STATE_COLUMNS only).
+    The index records the column order, per-driver row offsets of every level and the
+    session's track and metadata.
+    """
+    state = PackedReplayState.from_frames(race_data["drivers"], extra_columns=STORE_EXTRA_COLUMNS)
+    # Decimated here, while the state is in memory, so a mapped replay never has to
+    levels = [(factor, decimate_state(state, factor)) for factor in LOD_FACTORS[1:]]
+
+    index = {
+        "loader_version": LOADER_VERSION,
+        "store_version": STORE_VERSION,
+        "dtype": STORE_DTYPE,
+        "columns": list(state.columns),
+        "total_rows": int(state.lengths.sum()),
+        "drivers": [
+            {"id": drv, "offset": int(offset), "length": int(length)}
+            for drv, offset, length in zip(state.driver_ids, state.offsets, state.lengths)
+        ],
+        "levels": [
+            {
+                "factor": factor,
+                "columns": list(STATE_COLUMNS),
+                "total_rows": int(level.lengths.sum()),
+                "offsets": [int(offset) for offset in level.offsets],
+                "lengths": [int(length) for length in level.lengths],
+            }
+            for factor, level in levels
+        ],
+        "bounds": [float(b) for b in race_data["track"]["bounds"]],
+        "robust_bounds": [float(b) for b in race_data["track"].get("robust_bounds", race_data["track"]["bounds"])],
+        "metadata": race_data["metadata"],
+    }
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".bin.tmp", "wb") as f:
+        for col in state.columns:
+            state.columns[col].astype(STORE_DTYPE, copy=False).tofile(f)
+        for _, level in levels:
+            for col in STATE_COLUMNS:
+                level.columns[col].astype(STORE_DTYPE, copy=False).tofile(f)
+    with open(path + ".json.tmp", "w") as f:
+        json.dump(index, f)
+
+    # The index is renamed last: a store only counts as present once it exists
+    os.replace(path + ".bin.tmp", path + ".bin")
+    os.replace(path + ".json.tmp", path + ".json")
+
+def open_store(path):
+    """
+    Maps a store read-only and returns it in load_race's shape, with "drivers" as a
+    PackedReplayState whose columns are np.memmap views (pages load on first touch).
+    The stored LOD levels are mapped too and attached as state.levels.
+    Returns None when the store is missing or from another loader or store version.
+    """
+    try:
+        with open(path + ".json") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if index.get("loader_version") != LOADER_VERSION or index.get("store_version", 1) != STORE_VERSION:
+        return None
+    if index["total_rows"] == 0:
+        return None
+
+    columns = index["columns"]
+    mapped = np.memmap(
+        path + ".bin",
+        dtype=index["dtype"],
+        mode="r",
+        shape=(len(columns), index["total_rows"])
+    )
+
+    drivers = index["drivers"]
+    state = PackedReplayState(
+        [d["id"] for d in drivers],
+        {col: mapped[i] for i, col in enumerate(columns)},
+        [d["offset"] for d in drivers],
+        [d["length"] for d in drivers]
+    )
+
+    driver_ids = state.driver_ids
+    itemsize = np.dtype(index["dtype"]).itemsize
+    offset = len(columns) * index["total_rows"] * itemsize
+    for level in index["levels"]:
+        level_columns = level["columns"]
+        level_mapped = np.memmap(
+            path + ".bin",
+            dtype=index["dtype"],
+            mode="r",
+            offset=offset,
+            shape=(len(level_columns), level["total_rows"])
+        )
+        state.levels[level["factor"]] = PackedReplayState(
+            driver_ids,
+            {col: level_mapped[i] for i, col in enumerate(level_columns)},
+            level["offsets"],
+            level["lengths"]
+        )
+        offset += len(level_columns) * level["total_rows"] * itemsize
+
+    return {
+        "drivers": state,
+        "track": {
+            "bounds": tuple(index["bounds"]),
+            "robust_bounds": tuple(index.get("robust_bounds", index["bounds"])),
+            "timeline": Timeline.from_state(state)
+        },
+        "metadata": index["metadata"]
+    }
@@ -0,0 +1,77 @@
+import numpy as np
+
+class Timeline:
+    """
+    Session time axis across all drivers.
+    Only start/end (each driver's first and last sample) and the driver count are kept,
+    never the time arrays themselves, so a timeline does not pin any driver's frame.
+    The merged union of every timestamp is built on request by merged_times().
+    Indexing with [0] and [-1] returns start and end.
+    """
+
+    def __init__(self, time_arrays):
+        # Each array must be sorted ascending (load_race sorts every driver by Time)
+        self.n_drivers = 0
+        self.start = self.end = 0.0
+        for arr in time_arrays:
+            if len(arr) == 0:
+                continue
+            first, last = float(arr[0]), float(arr[-1])
+            if self.n_drivers == 0:
+                self.start, self.end = first, last
+            else:
+                self.start, self.end = min(self.start, first), max(self.end, last)
+            self.n_drivers += 1
+
+    @classmethod
+    def from_frames(cls, drivers_data):
+        return cls(_time_column(telemetry) for telemetry in drivers_data.values())
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.time[state.driver_slice(drv)] for drv in state.driver_ids)
+
+    @staticmethod
+    def merged_times(drivers_data):
+        """
+        Merged, deduplicated float64 array of every driver's timestamps
+        ({driver: frame} or a PackedReplayState).
+        """
+        if hasattr(drivers_data, "driver_slice"):
+            arrays = [drivers_data.time[drivers_data.driver_slice(drv)] for drv in drivers_data.driver_ids]
+        else:
+            arrays = [_time_column(telemetry) for telemetry in drivers_data.values()]
+        arrays = [np.asarray(arr, dtype=np.float64) for arr in arrays if len(arr) > 0]
+        if not arrays:
+            return np.zeros(0)
+        return np.unique(np.concatenate(arrays))
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def grid(self, step):
+        """
+        Uniform frame times from start to end (inclusive) every `step` seconds.
+        """
+        if not self:
+            return np.zeros(0)
+        n_frames = int(np.floor(self.duration / step)) + 1
+        return self.start + np.arange(n_frames) * step
+
+    def __bool__(self):
+        return self.n_drivers > 0
+
+    def __getitem__(self, i):
+        if self and i == 0:
+            return self.start
+        if self and i == -1:
+            return self.end
+        raise IndexError("Timeline only indexes its start [0] and end [-1]; see merged_times()")
+
+    def __repr__(self):
+        return f"Timeline(start={self.start:.3f}, end={self.end:.3f}, drivers={self.n_drivers})"
+
+def _time_column(telemetry):
+    # A view for DataFrames; only used transiently, never stored on the timeline
+    return np.asarray(telemetry["Time"])